@@ -8,7 +8,9 @@ Using a separate router ensures these routes have priority over catch-all routes
 
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import base64
+import json
 import re
 
 from auth import extract_user_from_headers_optional
@@ -29,6 +31,8 @@ from db import (
     get_all_tenant_endpoints,
     set_tenant_endpoint_override,
     delete_tenant_endpoint_override,
+    PAGE_SIZE_DEFAULT,
+    page_size,
 )
 from tenants import ALL_SERVERS
 
@@ -72,6 +76,36 @@ async def require_mcp_admin(request: Request) -> str:
     return user.email
 
 
+# =============================================================================
+# PAGINATION HELPERS
+# =============================================================================
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort key of a page's last row as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[tuple]:
+    """Decode a cursor from encode_cursor(). Raises 400 if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(values)
+
+
+def next_cursor(rows: list, limit: int, *fields: str) -> Optional[str]:
+    """Cursor for the page after rows, or None if rows is the last page."""
+    # Same clamp the queries apply, so a short page is always recognised as the last
+    if not rows or len(rows) < page_size(limit):
+        return None
+    return encode_cursor([rows[-1][f] for f in fields])
+
+
 # =============================================================================
 # REQUEST/RESPONSE MODELS
 # =============================================================================
@@ -126,20 +160,24 @@ class EndpointOverrideDeleteRequest(BaseModel):
 # =============================================================================
 
 @admin_router.get("/users")
-async def list_users_with_groups(request: Request):
+async def list_users_with_groups(request: Request, limit: int = PAGE_SIZE_DEFAULT,
+                                 cursor: Optional[str] = None):
     """
-    List all users with their group memberships.
+    List users with their group memberships, one page at a time.
 
     Requires Open WebUI admin role.
-    Returns: {count: int, users: [{email, groups: [...], updated_at}, ...]}
+    Pass next_cursor back as ?cursor= to fetch the following page.
+    Returns: {count: int, users: [{email, groups: [...], updated_at}, ...], next_cursor}
     """
     admin_email = await require_admin(request)
     print(f"[ADMIN] {admin_email} listing all users")
 
-    users = await get_all_users_with_groups()
+    after = decode_cursor(cursor, 1)
+    users = await get_all_users_with_groups(limit, after[0] if after else None)
     return {
         "count": len(users),
-        "users": users
+        "users": users,
+        "next_cursor": next_cursor(users, limit, "email")
     }
 
 
@@ -337,19 +375,21 @@ async def delete_existing_group(group_name: str, request: Request):
 # =============================================================================
 
 @admin_router.get("/tenant-keys")
-async def list_tenant_keys(request: Request):
+async def list_tenant_keys(request: Request, limit: int = PAGE_SIZE_DEFAULT,
+                           cursor: Optional[str] = None):
     """
-    List all tenant-specific API keys (without values).
+    List tenant-specific API keys (without values), one page at a time.
 
     Requires MCP-Admin group membership.
-    Returns list of {tenant_id, server_id, key_name, updated_at}.
+    Returns list of {tenant_id, server_id, key_name, updated_at} and next_cursor.
     """
     admin_email = await require_mcp_admin(request)
 
-    keys = await get_all_tenant_keys()
+    keys = await get_all_tenant_keys(limit, decode_cursor(cursor, 3))
     return {
         "count": len(keys),
-        "keys": keys
+        "keys": keys,
+        "next_cursor": next_cursor(keys, limit, "tenant_id", "server_id", "key_name")
     }
 
 
@@ -438,24 +478,26 @@ async def remove_tenant_key(body: TenantKeyDeleteRequest, request: Request):
 # =============================================================================
 
 @admin_router.get("/endpoints")
-async def list_endpoint_overrides(request: Request):
+async def list_endpoint_overrides(request: Request, limit: int = PAGE_SIZE_DEFAULT,
+                                  cursor: Optional[str] = None):
     """
-    List all tenant endpoint overrides.
+    List tenant endpoint overrides, one page at a time.
 
     Requires Open WebUI admin role.
     """
     admin_email = await require_admin(request)
     print(f"[ADMIN] {admin_email} listing endpoint overrides")
 
-    endpoints = await get_all_tenant_endpoints()
+    endpoints = await get_all_tenant_endpoints(limit, decode_cursor(cursor, 2))
     return {
         "count": len(endpoints),
+        "next_cursor": next_cursor(endpoints, limit, "tenant_id", "server_id"),
         "endpoints": [
             {
                 "tenant_id": e["tenant_id"],
                 "server_id": e["server_id"],
                 "endpoint_url": e["endpoint_url"],
-                "created_at": e["created_at"].isoformat() if e.get("created_at") else None
+                "created_at": e.get("created_at")
             }
             for e in endpoints
         ]
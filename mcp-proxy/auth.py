@@ -28,47 +28,88 @@ Authentication Priority:
 5. Reject requests without valid JWT (unless API_GATEWAY_MODE=true)
 """
 import os
+import hmac
+import asyncio
+import time
+import base64
+import hashlib
 import jwt
+import orjson
 import asyncpg
 from fastapi import Request, HTTPException
-from typing import Optional, List
-from dataclasses import dataclass, field
+from typing import Final, Optional, Tuple
+from dataclasses import dataclass
 
 # Open WebUI JWT secret - must match WEBUI_SECRET_KEY in Open WebUI
-WEBUI_SECRET_KEY = os.environ.get("WEBUI_SECRET_KEY", "")
+WEBUI_SECRET_KEY: Final[str] = os.environ.get("WEBUI_SECRET_KEY", "")
+_SECRET_BYTES: Final[bytes] = WEBUI_SECRET_KEY.encode()
+
+# Reusable decoder - Open WebUI tokens only need signature + exp checks.
+# exp is verified when present but not required: Open WebUI omits it when
+# JWT_EXPIRES_IN is -1.
+_JWT: Final = jwt.PyJWT()
+_JWT_ALGORITHMS: Final = ("HS256",)
+_JWT_OPTIONS: Final = {
+    "verify_signature": True,
+    "verify_exp": True,
+    "verify_nbf": False,
+    "verify_iat": False,
+    "verify_aud": False,
+    "verify_iss": False,
+}
 
 # API Gateway mode - when True, trust headers from API Gateway (APIM/Kong validates tokens externally)
-API_GATEWAY_MODE = os.environ.get("API_GATEWAY_MODE", "false").lower() == "true"
+API_GATEWAY_MODE: Final[bool] = os.environ.get("API_GATEWAY_MODE", "false").lower() == "true"
 
 # Database URL for looking up user email by ID (Open WebUI's database)
-DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DATABASE_URL: Final[str] = os.environ.get("DATABASE_URL", "")
 
 # Debug logging
-DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
+DEBUG: Final[bool] = os.environ.get("DEBUG", "false").lower() == "true"
 
 # Database connection pool (initialized lazily)
 _db_pool: Optional[asyncpg.Pool] = None
+_db_pool_lock = asyncio.Lock()
 
 
 def _log(msg: str):
     """Debug logging."""
-    if DEBUG:
-        print(f"[AUTH] {msg}")
+    if not DEBUG:
+        return
+    print(f"[AUTH] {msg}")
 
 
 async def _get_db_pool() -> Optional[asyncpg.Pool]:
     """Get or create database connection pool."""
     global _db_pool
-    if _db_pool is None and DATABASE_URL:
-        try:
-            _db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=5)
-            _log("Database connection pool created for auth")
-        except Exception as e:
-            _log(f"Failed to create database pool: {e}")
-            return None
+    if _db_pool is not None or not DATABASE_URL:
+        return _db_pool
+    async with _db_pool_lock:
+        # Re-check: another task may have created the pool while we waited
+        if _db_pool is None:
+            try:
+                _db_pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=5)
+                _log("Database connection pool created for auth")
+            except Exception as e:
+                _log(f"Failed to create database pool: {e}")
+                return None
     return _db_pool
 
 
+async def init_db_pool():
+    """Create the auth database pool up front (called on application startup)."""
+    await _get_db_pool()
+
+
+async def close_db_pool():
+    """Close the auth database pool (called on application shutdown)."""
+    global _db_pool
+    if _db_pool is not None:
+        await _db_pool.close()
+        _db_pool = None
+        _log("Database connection pool closed for auth")
+
+
 async def lookup_email_by_user_id(user_id: str) -> Optional[str]:
     """
     Look up user email from Open WebUI's database using user ID.
@@ -101,7 +142,7 @@ async def lookup_email_by_user_id(user_id: str) -> Optional[str]:
         return None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UserInfo:
     """User information extracted from Open WebUI headers, JWT, or API Gateway."""
     email: str
@@ -110,12 +151,71 @@ class UserInfo:
     role: str
     chat_id: Optional[str] = None
     # Entra ID specific fields (populated via API Gateway or headers)
-    entra_groups: List[str] = field(default_factory=list)
+    entra_groups: Tuple[str, ...] = ()
     entra_tenant_id: Optional[str] = None
     # Track authentication method for auditing
     auth_method: str = "unknown"
 
 
+def _parse_groups(groups_header: str) -> Tuple[str, ...]:
+    """Parse a comma-separated groups header into a tuple of non-empty group names."""
+    if not groups_header:
+        return ()
+    return tuple(g for g in map(str.strip, groups_header.split(",")) if g)
+
+
+def _name_from_email(email: str) -> str:
+    """Fallback display name: the local part of the email address."""
+    at = email.find("@")
+    return email[:at] if at >= 0 else email
+
+
+def _b64url_decode(segment: str) -> bytes:
+    """Decode an unpadded base64url JWT segment."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _verify_hs256(token: str) -> Optional[dict]:
+    """
+    Verify an HS256 JWT directly with hmac/hashlib, bypassing PyJWT.
+
+    Returns the claims if the token is valid. Returns None if the token is
+    not a plain HS256 JWT, so the caller can fall back to PyJWT. Raises the
+    same jwt exceptions as PyJWT for bad signatures and expired tokens.
+    """
+    try:
+        h64, p64, s64 = token.split(".")
+        header = orjson.loads(_b64url_decode(h64))
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        return None
+
+    signing_input = token[:len(h64) + 1 + len(p64)].encode()
+    mac = hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    try:
+        signature = _b64url_decode(s64)
+    except ValueError:
+        raise jwt.InvalidSignatureError("Invalid signature padding")
+    if not hmac.compare_digest(mac, signature):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+
+    try:
+        claims = orjson.loads(_b64url_decode(p64))
+    except ValueError as e:
+        raise jwt.DecodeError(f"Invalid payload: {e}")
+    if not isinstance(claims, dict):
+        raise jwt.DecodeError("Invalid payload: not a JSON object")
+
+    exp = claims.get("exp")
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+        if exp <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    return claims
+
+
 def _validate_jwt(token: str) -> Optional[dict]:
     """
     Validate JWT signature and return claims if valid.
@@ -131,7 +231,9 @@ def _validate_jwt(token: str) -> Optional[dict]:
 
     try:
         # Validate signature using WEBUI_SECRET_KEY (same key Open WebUI uses)
-        claims = jwt.decode(token, WEBUI_SECRET_KEY, algorithms=["HS256"])
+        claims = _verify_hs256(token)
+        if claims is None:
+            claims = _JWT.decode(token, _SECRET_BYTES, algorithms=_JWT_ALGORITHMS, options=_JWT_OPTIONS)
         _log(f"JWT validated successfully - claims: {list(claims.keys())}")
         return claims
     except jwt.ExpiredSignatureError:
@@ -169,15 +271,18 @@ def extract_user_from_entra_token(request: Request) -> Optional[UserInfo]:
         return None
 
     # Groups from the actual Entra ID token (most trustworthy)
-    groups_header = request.headers.get("X-Entra-Groups", "")
-    groups = [g.strip() for g in groups_header.split(",") if g.strip()]
+    groups = _parse_groups(request.headers.get("X-Entra-Groups", ""))
 
     _log(f"Entra Token auth (SECURE): {email} with {len(groups)} groups from token")
 
+    name = request.headers.get("X-OpenWebUI-User-Name")
+    if name is None:
+        name = _name_from_email(email)
+
     return UserInfo(
         email=email,
         user_id=request.headers.get("X-Entra-OID", ""),
-        name=request.headers.get("X-OpenWebUI-User-Name", email.split("@")[0]),
+        name=name,
         role="admin" if "MCP-Admin" in groups else "user",
         chat_id=None,
         entra_groups=groups,
@@ -211,8 +316,7 @@ def extract_user_from_api_gateway(request: Request) -> Optional[UserInfo]:
         return None
 
     # Parse groups from comma-separated string
-    groups_header = request.headers.get("X-User-Groups", "")
-    groups = [g.strip() for g in groups_header.split(",") if g.strip()]
+    groups = _parse_groups(request.headers.get("X-User-Groups", ""))
 
     # Check admin status (from auth-service or infer from groups)
     is_admin_header = request.headers.get("X-User-Admin", "false").lower()
@@ -220,10 +324,14 @@ def extract_user_from_api_gateway(request: Request) -> Optional[UserInfo]:
 
     _log(f"API Gateway auth: {email} with groups: {groups}, admin: {is_admin}")
 
+    name = request.headers.get("X-User-Name")
+    if name is None:
+        name = _name_from_email(email)
+
     return UserInfo(
         email=email,
         user_id=request.headers.get("X-User-OID", ""),
-        name=request.headers.get("X-User-Name", email.split("@")[0]),
+        name=name,
         role="admin" if is_admin else "user",
         chat_id=None,
         entra_groups=groups,
@@ -232,17 +340,13 @@ def extract_user_from_api_gateway(request: Request) -> Optional[UserInfo]:
     )
 
 
-def _extract_user_from_headers_after_jwt_validation(request: Request) -> Optional[UserInfo]:
+def _extract_user_from_headers_after_jwt_validation(request: Request, email: str) -> UserInfo:
     """
-    Extract user info from X-OpenWebUI-* headers.
+    Build user info from X-OpenWebUI-* headers for an already-known email.
 
     SECURITY: This should ONLY be called AFTER JWT validation succeeds.
     The JWT proves the request came from Open WebUI, making headers trustworthy.
     """
-    email = request.headers.get("X-OpenWebUI-User-Email")
-    if not email:
-        return None
-
     # Parse groups from multiple possible header names
     groups_header = (
         request.headers.get("X-OpenWebUI-User-Groups") or
@@ -250,7 +354,7 @@ def _extract_user_from_headers_after_jwt_validation(request: Request) -> Optiona
         request.headers.get("X-Entra-Groups") or
         ""
     )
-    groups = [g.strip() for g in groups_header.split(",") if g.strip()]
+    groups = _parse_groups(groups_header)
 
     _log(f"Header auth (JWT-validated): {email} with groups: {groups}")
 
@@ -265,41 +369,12 @@ def _extract_user_from_headers_after_jwt_validation(request: Request) -> Optiona
     )
 
 
-async def extract_user_from_headers_optional(request: Request) -> Optional[UserInfo]:
-    """
-    Extract user info securely, returning None if authentication fails.
-
-    SECURITY MODEL (in priority order):
-    1. Entra ID Token mode: X-Auth-Source: entra-token (groups from actual Entra ID JWT)
-    2. API Gateway mode: Trust API Gateway headers (gateway validates externally)
-    3. JWT-first mode: Validate Open WebUI JWT, then trust headers
-    4. Database lookup: If JWT has user_id but no email, look up from database
-    5. Reject if no valid authentication
-
-    This prevents header spoofing attacks where an attacker could send:
-        X-OpenWebUI-User-Email: admin@company.com
-    without valid authentication.
+async def _authenticate_jwt(request: Request) -> Optional[UserInfo]:
     """
-    # ==========================================================================
-    # Mode 1: Entra ID Token (MOST SECURE - groups from actual Entra ID JWT)
-    # ==========================================================================
-    # This is used when requests come from mcp_entra_token_auth.py function
-    # which decodes the actual Entra ID token and extracts groups from claims
-    user = extract_user_from_entra_token(request)
-    if user:
-        _log(f"Using Entra ID Token authentication (most secure): {user.email}")
-        return user
-
-    # ==========================================================================
-    # Mode 2: API Gateway (external token validation)
-    # ==========================================================================
-    if API_GATEWAY_MODE:
-        _log("Using API Gateway authentication mode")
-        user = extract_user_from_api_gateway(request)
-        if user:
-            return user
-        _log("API Gateway headers not present")
+    JWT-first authentication: validate the Open WebUI JWT, then trust headers.
 
+    Falls back to JWT claims and finally to a database lookup by user id.
+    """
     # ==========================================================================
     # Mode 3: JWT-First Authentication (SECURE - default mode)
     # ==========================================================================
@@ -320,10 +395,10 @@ async def extract_user_from_headers_optional(request: Request) -> Optional[UserI
     _log("JWT validated - headers are now trustworthy")
 
     # Step 3: JWT is valid! Now we can trust the headers
-    # Try to get user info from X-OpenWebUI-* headers first (more complete)
-    user = _extract_user_from_headers_after_jwt_validation(request)
-    if user:
-        return user
+    # Use X-OpenWebUI-* headers when present (more complete)
+    email = request.headers.get("X-OpenWebUI-User-Email")
+    if email:
+        return _extract_user_from_headers_after_jwt_validation(request, email)
 
     # Step 4: Fallback - extract user info from JWT claims directly
     # (Open WebUI JWT may have limited claims like id, exp, jti)
@@ -366,6 +441,56 @@ async def extract_user_from_headers_optional(request: Request) -> Optional[UserI
     return None
 
 
+async def _impl_entra_then_jwt(request: Request) -> Optional[UserInfo]:
+    """Default deployment: Entra ID token headers, then JWT-first authentication."""
+    # Mode 1: Entra ID Token (MOST SECURE - groups from actual Entra ID JWT)
+    user = extract_user_from_entra_token(request)
+    if user:
+        _log(f"Using Entra ID Token authentication (most secure): {user.email}")
+        return user
+
+    return await _authenticate_jwt(request)
+
+
+async def _impl_gateway(request: Request) -> Optional[UserInfo]:
+    """API_GATEWAY_MODE deployment: Entra ID token headers, gateway headers, then JWT."""
+    # Mode 1: Entra ID Token (MOST SECURE - groups from actual Entra ID JWT)
+    user = extract_user_from_entra_token(request)
+    if user:
+        _log(f"Using Entra ID Token authentication (most secure): {user.email}")
+        return user
+
+    # Mode 2: API Gateway (external token validation)
+    _log("Using API Gateway authentication mode")
+    user = extract_user_from_api_gateway(request)
+    if user:
+        return user
+    _log("API Gateway headers not present")
+
+    return await _authenticate_jwt(request)
+
+
+# =============================================================================
+# extract_user_from_headers_optional(request) -> Optional[UserInfo]
+# =============================================================================
+# Extract user info securely, returning None if authentication fails.
+#
+# SECURITY MODEL (in priority order):
+# 1. Entra ID Token mode: X-Auth-Source: entra-token (groups from actual Entra ID JWT)
+# 2. API Gateway mode: Trust API Gateway headers (gateway validates externally)
+# 3. JWT-first mode: Validate Open WebUI JWT, then trust headers
+# 4. Database lookup: If JWT has user_id but no email, look up from database
+# 5. Reject if no valid authentication
+#
+# This prevents header spoofing attacks where an attacker could send:
+#     X-OpenWebUI-User-Email: admin@company.com
+# without valid authentication.
+#
+# API_GATEWAY_MODE is fixed for the lifetime of the process, so the
+# implementation is chosen once at import instead of branching per request.
+extract_user_from_headers_optional = _impl_gateway if API_GATEWAY_MODE else _impl_entra_then_jwt
+
+
 async def extract_user_from_headers(request: Request) -> UserInfo:
     """
     Extract user info from headers with JWT validation. Raises 401 if authentication fails.
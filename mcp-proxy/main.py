@@ -15,19 +15,25 @@ URL Examples:
   POST /github_search_repositories - Legacy format (still works)
 """
 from fastapi import FastAPI, Request, HTTPException, APIRouter
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from fastapi.openapi.utils import get_openapi
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple
 import httpx
 import asyncio
+import logging
+import orjson
 import os
 import re
+import time
 from contextlib import asynccontextmanager
+from heapq import nlargest
+from operator import itemgetter
+from cachetools import TTLCache
 
-from auth import extract_user_from_headers, extract_user_from_headers_optional
+from auth import extract_user_from_headers, extract_user_from_headers_optional, init_db_pool, close_db_pool
 from tenants import (
     get_tenant, TENANTS,
     get_server, get_all_servers, ALL_SERVERS, ServerTier,
@@ -37,13 +43,17 @@ from tenants import (
 )
 from db import (
     get_pool,
+    init_pool,
+    close_pool,
     get_tenant_api_keys_for_server,
     get_tenant_api_key,
     set_tenant_api_key,
     delete_tenant_api_key,
     get_all_tenant_keys,
     get_tenant_keys_by_tenant,
-    get_tenant_endpoint_override,
+    get_tenant_routing,
+    prefetch_user_context,
+    group_mappings_version,
     # Admin Portal imports
     is_openwebui_admin,
     get_all_users_with_groups,
@@ -67,14 +77,53 @@ from tool_embeddings import (
 from admin_api import admin_router
 
 
+# Request-level detail is logged at DEBUG; set LOG_LEVEL=DEBUG to see it
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("mcp_proxy")
+
 # Global cache for tools
 TOOLS_CACHE: Dict[str, Dict[str, Any]] = {}
+# TOOLS_CACHE entries grouped by tenant_id, rebuilt by refresh_tools_cache
+TOOLS_BY_TENANT: Dict[str, List[Dict[str, Any]]] = {}
+
+# Keyword fallback for /meta/search_tools: token -> tool names whose name or
+# description contains it, and each tool's name tokens (name hits rank higher)
+KEYWORD_INDEX: Dict[str, Set[str]] = {}
+TOOL_NAME_TOKENS: Dict[str, frozenset] = {}
+KEYWORD_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# /meta/describe_tools entry for each cached tool, built by refresh_tools_cache
+TOOL_DESCRIPTIONS: Dict[str, Dict[str, Any]] = {}
 OPENAPI_SCHEMAS_CACHE: Dict[str, Any] = {}
 
+# Assembled /openapi.json specs keyed by (user, groups, tools version, group
+# mappings version). refresh_tools_cache bumps OPENAPI_VERSION, group mapping
+# changes bump the db version, and the TTL bounds staleness from per-user
+# access changes.
+OPENAPI_VERSION = 0
+OPENAPI_SPEC_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=30.0)
+
+# META_TOOLS_MODE spec is the same for every user: built once per tools
+# refresh, and served as pre-encoded JSON
+META_OPENAPI_CACHED: Optional[Dict[str, Any]] = None
+META_OPENAPI_BYTES: Optional[bytes] = None
+
+# Standard-mode spec pieces that don't depend on the user: per-server path
+# entries and merged component schemas, rebuilt after each tools refresh
+OPENAPI_FRAGMENTS: Optional[Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]] = None
+
 # Meta-tools mode: when enabled, OpenAPI spec shows only 3 meta-tools instead of 200+ tools
 # This reduces token usage by 96-99% (Speakeasy Dynamic Toolsets pattern)
 META_TOOLS_MODE = os.getenv("META_TOOLS_MODE", "false").lower() == "true"
 
+# /meta/stats is served from an in-memory snapshot refreshed in the background,
+# so monitoring scrapes never hit the database: (stats, monotonic timestamp)
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "30"))
+STATS_SNAPSHOT: Optional[Tuple[Dict[str, Any], float]] = None
+
 
 class ToolExecuteRequest(BaseModel):
     """Request body for tool execution."""
@@ -98,17 +147,56 @@ class CallToolRequest(BaseModel):
     arguments: Dict[str, Any] = {}
 
 
-async def fetch_openapi_from_tenant(tenant_id: str, endpoint: str, api_key: str) -> Optional[Dict]:
+# OpenAPI paths on MCP servers that are not tools
+SKIP_TOOL_PATHS = frozenset(("/health", "/docs", "/openapi.json", "/redoc", "/"))
+
+# Upper bound on concurrent OpenAPI fetches during a tools cache refresh
+OPENAPI_FETCH_CONCURRENCY = 20
+
+# Tool lists parsed from remote servers' OpenAPI for GET /{server_id}, keyed
+# by server_id; cleared on every tools refresh
+REMOTE_TOOLS_CACHE: TTLCache = TTLCache(maxsize=256, ttl=300.0)
+# server_id -> (ETag, tools) from the last listing fetch; once the TTL entry
+# expires, a 304 to If-None-Match reuses the tools without re-parsing
+REMOTE_TOOLS_ETAGS: Dict[str, Tuple[str, List[Dict]]] = {}
+
+# Shared outbound client for MCP server OpenAPI fetches and tool calls, opened
+# in lifespan so keep-alive connections survive across requests and refreshes
+HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the shared pooled client (HTTP/2 when the h2 package is installed)."""
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=3.0,  # Reduced timeout from 10s to 3s
+        http2=http2,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128)
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if lifespan hasn't (e.g. in tests)."""
+    global HTTP_CLIENT
+    if HTTP_CLIENT is None:
+        HTTP_CLIENT = create_http_client()
+    return HTTP_CLIENT
+
+
+async def fetch_openapi_from_tenant(client: httpx.AsyncClient, tenant_id: str, endpoint: str, api_key: str) -> Optional[Dict]:
     """Fetch OpenAPI spec from a tenant's MCP server."""
     try:
         print(f"    Fetching OpenAPI from {tenant_id} at {endpoint}...")
-        async with httpx.AsyncClient(timeout=3.0) as client:  # Reduced timeout from 10s to 3s
-            response = await client.get(
-                f"{endpoint}/openapi.json",
-                headers={"Authorization": f"Bearer {api_key}"}
-            )
-            if response.status_code == 200:
-                return response.json()
+        response = await client.get(
+            f"{endpoint}/openapi.json",
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        if response.status_code == 200:
+            return orjson.loads(response.content)
     except Exception as e:
         print(f"Error fetching OpenAPI from {tenant_id}: {e}")
     return None
@@ -116,7 +204,8 @@ async def fetch_openapi_from_tenant(tenant_id: str, endpoint: str, api_key: str)
 
 async def refresh_tools_cache():
     """Fetch and cache tools from all configured servers."""
-    global TOOLS_CACHE, OPENAPI_SCHEMAS_CACHE
+    global TOOLS_CACHE, OPENAPI_SCHEMAS_CACHE, OPENAPI_VERSION, META_OPENAPI_CACHED, META_OPENAPI_BYTES
+    global OPENAPI_FRAGMENTS, TOOLS_BY_TENANT, KEYWORD_INDEX, TOOL_NAME_TOKENS, TOOL_DESCRIPTIONS
 
     print("Refreshing tools cache from all servers...")
 
@@ -124,14 +213,30 @@ async def refresh_tools_cache():
     enabled_servers = {k: v for k, v in ALL_SERVERS.items() if v.enabled}
     print(f"  Checking {len(enabled_servers)} enabled servers (skipping {len(ALL_SERVERS) - len(enabled_servers)} disabled)")
 
-    for server_id, server in enabled_servers.items():
+    # Fetch all specs concurrently over one client: the refresh takes as long
+    # as the slowest server instead of the sum of all of them
+    semaphore = asyncio.Semaphore(OPENAPI_FETCH_CONCURRENCY)
+
+    async def fetch(server_id: str, server) -> Optional[Dict]:
         api_key = os.getenv(server.api_key_env, "test-key") if server.api_key_env else "test-key"
+        async with semaphore:
+            return await fetch_openapi_from_tenant(client, server_id, server.endpoint_url, api_key)
 
-        openapi = await fetch_openapi_from_tenant(
-            server_id,
-            server.endpoint_url,
-            api_key
+    # Outside lifespan (no shared client yet) use a short-lived one
+    client = HTTP_CLIENT or create_http_client()
+    try:
+        results = await asyncio.gather(
+            *(fetch(server_id, server) for server_id, server in enabled_servers.items()),
+            return_exceptions=True
         )
+    finally:
+        if client is not HTTP_CLIENT:
+            await client.aclose()
+
+    for (server_id, server), openapi in zip(enabled_servers.items(), results):
+        if isinstance(openapi, BaseException):
+            print(f"Error fetching OpenAPI from {server_id}: {openapi}")
+            openapi = None
 
         if not openapi:
             print(f"  {server_id}: No OpenAPI available (may be offline or external)")
@@ -140,34 +245,71 @@ async def refresh_tools_cache():
         OPENAPI_SCHEMAS_CACHE[server_id] = openapi
 
         # Extract tools from OpenAPI paths
-        tools_count = 0
+        display_name = server.display_name
+        prefix = f"{server_id}_"
+        new_tools = {}
         for path, methods in openapi.get("paths", {}).items():
-            if path in ["/health", "/docs", "/openapi.json", "/redoc", "/"]:
+            if path in SKIP_TOOL_PATHS:
                 continue
 
+            original_name = None
             for method, spec in methods.items():
                 if method.lower() == "post":
-                    original_name = path.strip("/").replace("/", "_")
-                    tool_name = f"{server_id}_{original_name}"
+                    if original_name is None:
+                        clean_path = path.strip("/")
+                        original_name = clean_path.replace("/", "_")
+                    tool_name = prefix + original_name
 
-                    TOOLS_CACHE[tool_name] = {
+                    new_tools[tool_name] = {
                         "name": tool_name,
                         "original_name": original_name,
                         "original_path": path,
+                        "clean_path": clean_path,
+                        "endpoint": f"/{server_id}/{original_name}",
                         "tenant_id": server_id,
-                        "tenant_name": server.display_name,
-                        "description": spec.get("summary", spec.get("description", f"{server.display_name}: {original_name}")),
+                        "tenant_name": display_name,
+                        "description": spec["summary"] if "summary" in spec else spec.get("description", f"{display_name}: {original_name}"),
                         "request_body": spec.get("requestBody", {}),
                         "responses": spec.get("responses", {}),
                         "parameters": spec.get("parameters", [])
                     }
-                    tools_count += 1
 
+        TOOLS_CACHE.update(new_tools)
+        tools_count = len(new_tools)
         if tools_count > 0:
             print(f"  {server_id}: Cached {tools_count} tools")
 
     print(f"Cached {len(TOOLS_CACHE)} tools from {len(ALL_SERVERS)} servers")
 
+    # Per-tenant view for /tools and local server listings
+    by_tenant: Dict[str, List[Dict[str, Any]]] = {}
+    for tool_info in TOOLS_CACHE.values():
+        by_tenant.setdefault(tool_info["tenant_id"], []).append(tool_info)
+    TOOLS_BY_TENANT = by_tenant
+    KEYWORD_INDEX, TOOL_NAME_TOKENS = _build_keyword_index()
+    TOOL_DESCRIPTIONS = {
+        tool_name: {
+            "tool_name": tool_name,
+            "server_id": tool_info["tenant_id"],
+            "server_name": tool_info.get("tenant_name", ""),
+            "display_name": tool_info.get("original_name", tool_name),
+            "description": tool_info.get("description", ""),
+            "request_body": tool_info.get("request_body", {}),
+            "parameters": tool_info.get("parameters", []),
+            "endpoint": tool_info["endpoint"]
+        }
+        for tool_name, tool_info in TOOLS_CACHE.items()
+    }
+
+    # Tool list changed: cached OpenAPI specs are stale
+    OPENAPI_VERSION += 1
+    OPENAPI_SPEC_CACHE.clear()
+    META_OPENAPI_CACHED = None
+    META_OPENAPI_BYTES = None
+    OPENAPI_FRAGMENTS = None
+    REMOTE_TOOLS_CACHE.clear()
+    REMOTE_TOOLS_ETAGS.clear()
+
     # Generate and store embeddings for semantic search (meta-tools)
     if TOOLS_CACHE:
         try:
@@ -179,9 +321,55 @@ async def refresh_tools_cache():
             print("Meta-tools search will use keyword fallback")
 
 
+def _build_keyword_index() -> Tuple[Dict[str, Set[str]], Dict[str, frozenset]]:
+    """Tokenize every cached tool's name and description for the keyword fallback."""
+    index: Dict[str, Set[str]] = {}
+    name_tokens: Dict[str, frozenset] = {}
+    for tool_name, tool_info in TOOLS_CACHE.items():
+        names = frozenset(KEYWORD_TOKEN_RE.findall(tool_name.lower()))
+        name_tokens[tool_name] = names
+        words = names.union(KEYWORD_TOKEN_RE.findall(tool_info.get("description", "").lower()))
+        for token in words:
+            index.setdefault(token, set()).add(tool_name)
+    return index, name_tokens
+
+
+_UNSET = object()
+
+
+def request_groups(request: Request, user) -> Optional[frozenset]:
+    """The user's groups as a frozenset (None if none), built once per request.
+
+    Hashable for the access caches and O(1) for membership tests; the
+    tenants/db access helpers accept it wherever they take a group list.
+    """
+    groups = getattr(request.state, "groups", _UNSET)
+    if groups is _UNSET:
+        groups = frozenset(user.entra_groups) if user and user.entra_groups else None
+        request.state.groups = groups
+    return groups
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; much faster on large OpenAPI/tool payloads."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
+    global HTTP_CLIENT
+    HTTP_CLIENT = create_http_client()
+
+    # Startup: open database pools before serving so concurrent first requests
+    # don't each race to create one. The proxy and auth pools connect in
+    # parallel, and both are warm before refresh_tools_cache stores embeddings.
+    pool_result, _ = await asyncio.gather(init_pool(), init_db_pool(), return_exceptions=True)
+    if isinstance(pool_result, BaseException):
+        print(f"Warning: Could not create database pool at startup: {pool_result}")
+
     # Check if we should skip cache refresh on startup (for faster boot)
     skip_cache = os.getenv("SKIP_CACHE_REFRESH", "false").lower() == "true"
 
@@ -208,8 +396,17 @@ async def lifespan(app: FastAPI):
                 else:
                     print("Warning: Could not load tools after all retries. Use POST /refresh to reload.")
 
+    stats_task = asyncio.create_task(stats_refresher())
+
     yield
-    # Shutdown: cleanup if needed
+
+    stats_task.cancel()
+
+    # Shutdown: close database pools and the shared HTTP client
+    await close_db_pool()
+    await close_pool()
+    client, HTTP_CLIENT = HTTP_CLIENT, None
+    await client.aclose()
 
 
 app = FastAPI(
@@ -235,6 +432,7 @@ Kubernetes cluster on localhost:8080
 """,
     version="0.3.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     openapi_url=None  # Disable auto-generated OpenAPI, we provide our own
 )
 
@@ -297,163 +495,124 @@ async def admin_portal(request: Request):
     return HTMLResponse("<h1>Admin Portal not found</h1><p>static/admin.html is missing</p>", status_code=404)
 
 
-async def generate_dynamic_openapi() -> Dict[str, Any]:
-    """Generate OpenAPI spec with all cached tools as endpoints (no filtering)."""
-    return await generate_dynamic_openapi_filtered(None, None)
-
-
-async def generate_dynamic_openapi_filtered(user_email: Optional[str], entra_groups: Optional[List[str]]) -> Dict[str, Any]:
-    """Generate OpenAPI spec with tools filtered by user access (ASYNC - uses database).
-
-    When META_TOOLS_MODE=true, returns only 3 meta-tool endpoints (search, describe, call)
-    instead of 200+ individual tool endpoints. This is the Speakeasy Dynamic Toolsets pattern.
-    """
-
-    paths = {
-        "/health": {
-            "get": {
-                "summary": "Health Check",
-                "operationId": "health_check",
-                "responses": {"200": {"description": "Healthy"}}
-            }
-        },
-        "/servers": {
-            "get": {
-                "summary": "List All Servers",
-                "description": "List all available MCP servers organized by tier",
-                "operationId": "list_servers",
-                "responses": {"200": {"description": "List of servers"}}
-            }
-        },
-        "/refresh": {
-            "post": {
-                "summary": "Refresh Tools Cache",
-                "operationId": "refresh_cache",
-                "responses": {"200": {"description": "Cache refreshed"}}
-            }
-        }
-    }
-
-    # =========================================================================
-    # META-TOOLS MODE: Only expose 3 meta-tools instead of 200+ individual tools
-    # =========================================================================
-    if META_TOOLS_MODE:
-        paths["/meta/search_tools"] = {
-            "post": {
-                "summary": "Search for relevant tools by natural language query",
-                "description": (
-                    "Find tools that match your intent. For example: "
-                    "'create a task in ClickUp', 'read a file', 'search GitHub repos'. "
-                    "Returns ranked results with tool names and descriptions. "
-                    "Use the returned tool_name values with describe_tools and call_tool."
-                ),
-                "operationId": "search_tools",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "required": ["query"],
-                                "properties": {
-                                    "query": {
-                                        "type": "string",
-                                        "description": "Natural language description of what you want to do"
-                                    },
-                                    "limit": {
-                                        "type": "integer",
-                                        "default": 10,
-                                        "description": "Maximum number of results to return"
-                                    }
+def _build_meta_openapi(paths: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the 3 meta-tool endpoints to the base paths and wrap them in a spec."""
+    paths["/meta/search_tools"] = {
+        "post": {
+            "summary": "Search for relevant tools by natural language query",
+            "description": (
+                "Find tools that match your intent. For example: "
+                "'create a task in ClickUp', 'read a file', 'search GitHub repos'. "
+                "Returns ranked results with tool names and descriptions. "
+                "Use the returned tool_name values with describe_tools and call_tool."
+            ),
+            "operationId": "search_tools",
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "type": "object",
+                            "required": ["query"],
+                            "properties": {
+                                "query": {
+                                    "type": "string",
+                                    "description": "Natural language description of what you want to do"
+                                },
+                                "limit": {
+                                    "type": "integer",
+                                    "default": 10,
+                                    "description": "Maximum number of results to return"
                                 }
                             }
                         }
                     }
-                },
-                "responses": {
-                    "200": {"description": "List of matching tools with relevance scores"}
                 }
+            },
+            "responses": {
+                "200": {"description": "List of matching tools with relevance scores"}
             }
         }
+    }
 
-        paths["/meta/describe_tools"] = {
-            "post": {
-                "summary": "Get full parameter schemas for specific tools",
-                "description": (
-                    "After finding tools with search_tools, use this to get their "
-                    "complete parameter schemas before calling them. Pass an array of "
-                    "tool_name values from search_tools results."
-                ),
-                "operationId": "describe_tools",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "required": ["tool_names"],
-                                "properties": {
-                                    "tool_names": {
-                                        "type": "array",
-                                        "items": {"type": "string"},
-                                        "description": "List of tool names to describe (from search_tools results)"
-                                    }
+    paths["/meta/describe_tools"] = {
+        "post": {
+            "summary": "Get full parameter schemas for specific tools",
+            "description": (
+                "After finding tools with search_tools, use this to get their "
+                "complete parameter schemas before calling them. Pass an array of "
+                "tool_name values from search_tools results."
+            ),
+            "operationId": "describe_tools",
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "type": "object",
+                            "required": ["tool_names"],
+                            "properties": {
+                                "tool_names": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "List of tool names to describe (from search_tools results)"
                                 }
                             }
                         }
                     }
-                },
-                "responses": {
-                    "200": {"description": "Full schemas for requested tools"}
                 }
+            },
+            "responses": {
+                "200": {"description": "Full schemas for requested tools"}
             }
         }
+    }
 
-        paths["/meta/call_tool"] = {
-            "post": {
-                "summary": "Execute any tool by name with provided arguments",
-                "description": (
-                    "Execute a tool after discovering it with search_tools and "
-                    "getting its schema with describe_tools. Provide the full "
-                    "tool_name and arguments matching the schema."
-                ),
-                "operationId": "call_tool",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "required": ["tool_name"],
-                                "properties": {
-                                    "tool_name": {
-                                        "type": "string",
-                                        "description": "Full tool name (e.g., 'clickup_create_task')"
-                                    },
-                                    "arguments": {
-                                        "type": "object",
-                                        "additionalProperties": True,
-                                        "description": "Arguments matching the tool's schema from describe_tools"
-                                    }
+    paths["/meta/call_tool"] = {
+        "post": {
+            "summary": "Execute any tool by name with provided arguments",
+            "description": (
+                "Execute a tool after discovering it with search_tools and "
+                "getting its schema with describe_tools. Provide the full "
+                "tool_name and arguments matching the schema."
+            ),
+            "operationId": "call_tool",
+            "requestBody": {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": {
+                            "type": "object",
+                            "required": ["tool_name"],
+                            "properties": {
+                                "tool_name": {
+                                    "type": "string",
+                                    "description": "Full tool name (e.g., 'clickup_create_task')"
+                                },
+                                "arguments": {
+                                    "type": "object",
+                                    "additionalProperties": True,
+                                    "description": "Arguments matching the tool's schema from describe_tools"
                                 }
                             }
                         }
                     }
-                },
-                "responses": {
-                    "200": {"description": "Tool execution result"},
-                    "403": {"description": "Access denied"},
-                    "404": {"description": "Tool not found"},
-                    "500": {"description": "Execution failed"}
                 }
+            },
+            "responses": {
+                "200": {"description": "Tool execution result"},
+                "403": {"description": "Access denied"},
+                "404": {"description": "Tool not found"},
+                "500": {"description": "Execution failed"}
             }
         }
+    }
 
-        return {
-            "openapi": "3.1.0",
-            "info": {
-                "title": "MCP Proxy Gateway - Meta-Tools",
-                "description": f"""
+    return {
+        "openapi": "3.1.0",
+        "info": {
+            "title": "MCP Proxy Gateway - Meta-Tools",
+            "description": f"""
 MCP Proxy with Speakeasy Dynamic Toolsets.
 
 Instead of listing {len(TOOLS_CACHE)} individual tools, this proxy exposes 3 meta-tools:
@@ -474,46 +633,44 @@ Instead of listing {len(TOOLS_CACHE)} individual tools, this proxy exposes 3 met
 
 This reduces token usage by 96-99% compared to listing all tools.
 """,
-                "version": "0.4.0"
-            },
-            "paths": paths,
-            "components": {"schemas": {}}
-        }
+            "version": "0.4.0"
+        },
+        "paths": paths,
+        "components": {"schemas": {}}
+    }
 
-    # =========================================================================
-    # STANDARD MODE: Expose all individual tools (original behavior)
-    # =========================================================================
 
-    # Add hierarchical endpoints for each server (filtered by user access)
-    for server_id, config in ALL_SERVERS.items():
-        # Filter by user access if user is identified
-        if user_email:
-            if not await user_has_tenant_access_async(user_email, server_id, entra_groups):
-                continue  # Skip servers user doesn't have access to
+def _build_openapi_fragments() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Build the user-independent parts of the standard-mode spec.
+
+    Returns ({server_id: {path: operation}}, components). Each fragment holds the
+    server's list endpoint plus hierarchical and legacy endpoints for its tools.
+    """
+    fragments: Dict[str, Dict[str, Any]] = {}
 
+    # Add hierarchical endpoints for each server
+    for server_id, config in ALL_SERVERS.items():
         # GET /{server_id} - List tools for this server
-        paths[f"/{server_id}"] = {
-            "get": {
-                "summary": f"List {config.display_name} Tools",
-                "description": f"Get available tools for {config.display_name} ({config.tier.value})",
-                "operationId": f"list_{server_id}_tools",
-                "responses": {
-                    "200": {"description": f"List of {config.display_name} tools"},
-                    "403": {"description": "Access Denied"},
-                    "404": {"description": "Server not found"}
+        fragments[server_id] = {
+            f"/{server_id}": {
+                "get": {
+                    "summary": f"List {config.display_name} Tools",
+                    "description": f"Get available tools for {config.display_name} ({config.tier.value})",
+                    "operationId": f"list_{server_id}_tools",
+                    "responses": {
+                        "200": {"description": f"List of {config.display_name} tools"},
+                        "403": {"description": "Access Denied"},
+                        "404": {"description": "Server not found"}
+                    }
                 }
             }
         }
 
-    # Add hierarchical tool endpoints for cached tools (filtered by user access)
+    # Add hierarchical tool endpoints for cached tools
     for tool_name, tool_info in TOOLS_CACHE.items():
         server_id = tool_info["tenant_id"]
         original_name = tool_info["original_name"]
-
-        # Filter by user access if user is identified
-        if user_email:
-            if not await user_has_tenant_access_async(user_email, server_id, entra_groups):
-                continue  # Skip tools from servers user doesn't have access to
+        fragment = fragments.setdefault(server_id, {})
 
         # POST /{server_id}/{tool_name} - Hierarchical format (preferred)
         # Use original request_body schema if available (so AI knows what params to send)
@@ -531,7 +688,7 @@ This reduces token usage by 96-99% compared to listing all tools.
                 }
             }
 
-        paths[f"/{server_id}/{original_name}"] = {
+        fragment[f"/{server_id}/{original_name}"] = {
             "post": {
                 "summary": tool_info["description"],
                 "description": f"Server: {tool_info['tenant_name']} | Tool: {original_name}",
@@ -547,7 +704,7 @@ This reduces token usage by 96-99% compared to listing all tools.
         }
 
         # POST /{tenant}_{tool} - Legacy format (backward compatibility)
-        paths[f"/{tool_name}"] = {
+        fragment[f"/{tool_name}"] = {
             "post": {
                 "summary": f"[Legacy] {tool_info['description']}",
                 "description": f"LEGACY FORMAT. Prefer: POST /{server_id}/{original_name}",
@@ -573,11 +730,88 @@ This reduces token usage by 96-99% compared to listing all tools.
             }
         }
 
-    # Merge component schemas from all cached OpenAPI specs
-    components = {"schemas": {}}
-    for server_id, openapi_spec in OPENAPI_SCHEMAS_CACHE.items():
-        if "components" in openapi_spec and "schemas" in openapi_spec["components"]:
-            components["schemas"].update(openapi_spec["components"]["schemas"])
+    # Merge component schemas from all cached OpenAPI specs (once per refresh,
+    # every per-user spec shares this dict)
+    schemas: Dict[str, Any] = {}
+    for openapi_spec in OPENAPI_SCHEMAS_CACHE.values():
+        spec_schemas = openapi_spec.get("components", {}).get("schemas")
+        if spec_schemas:
+            schemas.update(spec_schemas)
+    components = {"schemas": schemas}
+
+    return fragments, components
+
+
+def _get_openapi_fragments() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Return the prebuilt spec fragments, building them after each tools refresh."""
+    global OPENAPI_FRAGMENTS
+    if OPENAPI_FRAGMENTS is None:
+        OPENAPI_FRAGMENTS = _build_openapi_fragments()
+    return OPENAPI_FRAGMENTS
+
+
+async def generate_dynamic_openapi() -> Dict[str, Any]:
+    """Generate OpenAPI spec with all cached tools as endpoints (no filtering)."""
+    return await generate_dynamic_openapi_filtered(None, None)
+
+
+async def generate_dynamic_openapi_filtered(user_email: Optional[str], entra_groups: Optional[frozenset]) -> Dict[str, Any]:
+    """Generate OpenAPI spec with tools filtered by user access (ASYNC - uses database).
+
+    When META_TOOLS_MODE=true, returns only 3 meta-tool endpoints (search, describe, call)
+    instead of 200+ individual tool endpoints. This is the Speakeasy Dynamic Toolsets pattern.
+    """
+
+    paths = {
+        "/health": {
+            "get": {
+                "summary": "Health Check",
+                "operationId": "health_check",
+                "responses": {"200": {"description": "Healthy"}}
+            }
+        },
+        "/servers": {
+            "get": {
+                "summary": "List All Servers",
+                "description": "List all available MCP servers organized by tier",
+                "operationId": "list_servers",
+                "responses": {"200": {"description": "List of servers"}}
+            }
+        },
+        "/refresh": {
+            "post": {
+                "summary": "Refresh Tools Cache",
+                "operationId": "refresh_cache",
+                "responses": {"200": {"description": "Cache refreshed"}}
+            }
+        }
+    }
+
+    # =========================================================================
+    # META-TOOLS MODE: Only expose 3 meta-tools instead of 200+ individual tools
+    # =========================================================================
+    if META_TOOLS_MODE:
+        global META_OPENAPI_CACHED
+        if META_OPENAPI_CACHED is None:
+            META_OPENAPI_CACHED = _build_meta_openapi(paths)
+        return META_OPENAPI_CACHED
+
+    # =========================================================================
+    # STANDARD MODE: Expose all individual tools (original behavior)
+    # =========================================================================
+
+    # Resolve the user's accessible servers once instead of once per server and tool
+    allowed_servers = None
+    if user_email:
+        allowed_servers = await get_user_tenants_async(user_email, entra_groups)
+
+    # Splice in the prebuilt per-server path entries the user may see
+    fragments, components = _get_openapi_fragments()
+    for server_id, fragment in fragments.items():
+        # Filter by user access if user is identified
+        if allowed_servers is not None and server_id not in allowed_servers:
+            continue  # Skip servers user doesn't have access to
+        paths.update(fragment)
 
     return {
         "openapi": "3.1.0",
@@ -607,17 +841,34 @@ Unified MCP Proxy for Kubernetes (localhost:8080)
 @app.get("/openapi.json", include_in_schema=False)
 async def custom_openapi(request: Request):
     """Return dynamically generated OpenAPI spec with tools filtered by user access."""
+    global META_OPENAPI_BYTES
+    if META_TOOLS_MODE:
+        # Not user-specific: skip auth and re-encoding entirely
+        if META_OPENAPI_BYTES is None:
+            spec = await generate_dynamic_openapi_filtered(None, None)
+            META_OPENAPI_BYTES = orjson.dumps(spec)
+        return Response(content=META_OPENAPI_BYTES, media_type="application/json")
+
     # Extract user info for filtering
     user = await extract_user_from_headers_optional(request)
     user_email = user.email if user else None
-    entra_groups = user.entra_groups if user else None
+    # Hashable, order-insensitive form of the groups, built once per request
+    groups_fs = request_groups(request, user)
 
-    print(f"=== /openapi.json request ===")
-    print(f"  User email: {user_email}")
+    logger.debug("/openapi.json request: user=%s", user_email)
 
-    # Generate filtered OpenAPI spec (async for database lookups)
-    openapi_spec = await generate_dynamic_openapi_filtered(user_email, entra_groups)
-    return JSONResponse(content=openapi_spec)
+    cache_key = (
+        user_email.lower() if user_email else None,
+        groups_fs,
+        OPENAPI_VERSION,
+        group_mappings_version(),
+    )
+    openapi_spec = OPENAPI_SPEC_CACHE.get(cache_key)
+    if openapi_spec is None:
+        # Generate filtered OpenAPI spec (async for database lookups)
+        openapi_spec = await generate_dynamic_openapi_filtered(user_email, groups_fs)
+        OPENAPI_SPEC_CACHE[cache_key] = openapi_spec
+    return ORJSONResponse(openapi_spec)
 
 
 @app.get("/health")
@@ -706,12 +957,9 @@ async def meta_search_tools(body: SearchToolsRequest, request: Request):
     """
     user = await extract_user_from_headers_optional(request)
     user_email = user.email if user else None
-    entra_groups = user.entra_groups if user else None
+    entra_groups = request_groups(request, user)
 
-    print(f"=== Meta: search_tools ===")
-    print(f"  User: {user_email}")
-    print(f"  Query: {body.query}")
-    print(f"  Limit: {body.limit}")
+    logger.debug("meta search_tools: user=%s query=%r limit=%s", user_email, body.query, body.limit)
 
     # Get user's allowed servers for access control filtering
     allowed_servers = None
@@ -727,37 +975,61 @@ async def meta_search_tools(body: SearchToolsRequest, request: Request):
         results = await search_tools_by_query(
             pool, body.query, allowed_servers, body.limit
         )
-        print(f"  Found {len(results)} matching tools")
-        return {
+        logger.debug("  found %d matching tools", len(results))
+        return ORJSONResponse({
             "query": body.query,
             "count": len(results),
             "results": results
-        }
+        })
     except Exception as e:
-        print(f"  Error: {e}")
-        # Fallback: search TOOLS_CACHE directly by keyword
+        logger.warning("Semantic tool search failed, using keyword fallback: %s", e)
+        # Fallback: keyword search over the precomputed token index
         query_lower = body.query.lower()
+        query_tokens = set(KEYWORD_TOKEN_RE.findall(query_lower))
+        allowed = allowed_servers or None
         matches = []
-        for tool_name, tool_info in TOOLS_CACHE.items():
-            if allowed_servers and tool_info["tenant_id"] not in allowed_servers:
-                continue
-            name_match = query_lower in tool_name.lower()
-            desc_match = query_lower in tool_info.get("description", "").lower()
-            if name_match or desc_match:
+        if query_tokens:
+            # Score by the share of query tokens each tool matches; a match in
+            # the tool name outranks one only in the description
+            hits: Dict[str, int] = {}
+            for token in query_tokens:
+                for tool_name in KEYWORD_INDEX.get(token, ()):
+                    hits[tool_name] = hits.get(tool_name, 0) + 1
+            for tool_name, hit_count in hits.items():
+                tool_info = TOOLS_CACHE.get(tool_name)
+                if tool_info is None or (allowed and tool_info["tenant_id"] not in allowed):
+                    continue
+                name_match = not query_tokens.isdisjoint(TOOL_NAME_TOKENS.get(tool_name, ()))
                 matches.append({
                     "tool_name": tool_name,
                     "server_id": tool_info["tenant_id"],
                     "display_name": tool_info.get("original_name", tool_name),
                     "description": tool_info.get("description", ""),
-                    "relevance_score": 0.8 if name_match else 0.5
+                    "relevance_score": round((0.8 if name_match else 0.5) * hit_count / len(query_tokens), 3)
                 })
-        matches.sort(key=lambda x: x["relevance_score"], reverse=True)
-        return {
+        else:
+            # No word characters to index on: plain substring scan
+            for tool_name, tool_info in TOOLS_CACHE.items():
+                if allowed and tool_info["tenant_id"] not in allowed:
+                    continue
+                name_match = query_lower in tool_name.lower()
+                desc_match = query_lower in tool_info.get("description", "").lower()
+                if name_match or desc_match:
+                    matches.append({
+                        "tool_name": tool_name,
+                        "server_id": tool_info["tenant_id"],
+                        "display_name": tool_info.get("original_name", tool_name),
+                        "description": tool_info.get("description", ""),
+                        "relevance_score": 0.8 if name_match else 0.5
+                    })
+        # Partial top-k selection; same order as a stable sort then slice
+        top = nlargest(body.limit, matches, key=itemgetter("relevance_score"))
+        return ORJSONResponse({
             "query": body.query,
-            "count": len(matches[:body.limit]),
-            "results": matches[:body.limit],
+            "count": len(top),
+            "results": top,
             "source": "cache_fallback"
-        }
+        })
 
 
 @app.post("/meta/describe_tools")
@@ -772,25 +1044,22 @@ async def meta_describe_tools(body: DescribeToolsRequest, request: Request):
     Returns the full requestBody schema, parameters, and server info
     for each requested tool.
     """
-    user = await extract_user_from_headers_optional(request)
-    user_email = user.email if user else None
-    entra_groups = user.entra_groups if user else None
+    found = [(name, TOOL_DESCRIPTIONS.get(name)) for name in body.tool_names]
 
-    print(f"=== Meta: describe_tools ===")
-    print(f"  User: {user_email}")
-    print(f"  Tools: {body.tool_names}")
-
-    # Get user's allowed servers
+    # Identify the user and get their allowed servers - only needed when
+    # some requested tool exists
     allowed_servers = None
-    if user_email:
-        tenant_ids = await get_user_tenants_async(user_email, entra_groups)
-        if tenant_ids:
-            allowed_servers = set(tenant_ids)
+    if any(description for _, description in found):
+        user = await extract_user_from_headers_optional(request)
+        logger.debug("meta describe_tools: user=%s tools=%s", user.email if user else None, body.tool_names)
+        if user:
+            tenant_ids = await get_user_tenants_async(user.email, request_groups(request, user))
+            if tenant_ids:
+                allowed_servers = tenant_ids
 
     descriptions = []
-    for tool_name in body.tool_names:
-        tool_info = TOOLS_CACHE.get(tool_name)
-        if not tool_info:
+    for tool_name, description in found:
+        if not description:
             descriptions.append({
                 "tool_name": tool_name,
                 "error": "Tool not found"
@@ -798,28 +1067,19 @@ async def meta_describe_tools(body: DescribeToolsRequest, request: Request):
             continue
 
         # Access control check
-        if allowed_servers and tool_info["tenant_id"] not in allowed_servers:
+        if allowed_servers and description["server_id"] not in allowed_servers:
             descriptions.append({
                 "tool_name": tool_name,
                 "error": "Access denied"
             })
             continue
 
-        descriptions.append({
-            "tool_name": tool_name,
-            "server_id": tool_info["tenant_id"],
-            "server_name": tool_info.get("tenant_name", ""),
-            "display_name": tool_info.get("original_name", tool_name),
-            "description": tool_info.get("description", ""),
-            "request_body": tool_info.get("request_body", {}),
-            "parameters": tool_info.get("parameters", []),
-            "endpoint": f"/{tool_info['tenant_id']}/{tool_info.get('original_name', tool_name)}"
-        })
+        descriptions.append(description)
 
-    return {
+    return ORJSONResponse({
         "count": len(descriptions),
         "tools": descriptions
-    }
+    })
 
 
 @app.post("/meta/call_tool")
@@ -834,68 +1094,77 @@ async def meta_call_tool(body: CallToolRequest, request: Request):
     The tool_name should be the full qualified name (e.g., "clickup_create_task").
     Arguments should match the schema returned by describe_tools.
     """
-    user = await extract_user_from_headers_optional(request)
-    user_email = user.email if user else None
-    entra_groups = user.entra_groups if user else None
-
-    print(f"=== Meta: call_tool ===")
-    print(f"  User: {user_email}")
-    print(f"  Tool: {body.tool_name}")
-    print(f"  Args: {body.arguments}")
-
-    # Look up tool in cache
+    # Look up tool in cache; unknown names are rejected before any auth work
     tool_info = TOOLS_CACHE.get(body.tool_name)
     if not tool_info:
         raise HTTPException(status_code=404, detail=f"Tool '{body.tool_name}' not found")
 
+    user = await extract_user_from_headers_optional(request)
+    user_email = user.email if user else None
+    entra_groups = request_groups(request, user)
+
+    logger.debug("meta call_tool: user=%s tool=%s args=%s", user_email, body.tool_name, body.arguments)
+
     server_id = tool_info["tenant_id"]
     original_path = tool_info["original_path"]
 
-    # Access control check
+    # Access control check. The user's tenant IDs are resolved once and serve
+    # both the check and the API key lookup (US-011).
+    tenant_ids = None
     if user_email:
-        has_access = await user_has_tenant_access_async(user_email, server_id, entra_groups)
-        if not has_access:
+        tenant_ids = await get_user_tenants_async(user_email, entra_groups)
+        if server_id not in tenant_ids:
             raise HTTPException(
                 status_code=403,
                 detail=f"User {user_email} does not have access to server '{server_id}'"
             )
 
-    # Get user's tenant IDs for API key lookup (US-011)
-    tenant_ids = None
-    if user_email:
-        tenant_ids = await get_user_tenants_async(user_email, entra_groups)
-
     # Execute via existing infrastructure
     server = get_server(server_id)
     if server and server.enabled:
-        return await execute_on_server(server, original_path.strip("/"), body.arguments, tenant_ids)
+        return await execute_on_server(server, tool_info["clean_path"], body.arguments, tenant_ids)
 
     # Fallback to tenant execution
     return await execute_tool_on_tenant(server_id, original_path, body.arguments, tenant_ids)
 
 
-@app.get("/meta/stats")
-async def meta_stats():
-    """Get statistics about tool embeddings."""
+async def refresh_stats_snapshot():
+    """Query embedding statistics and store them as the /meta/stats snapshot."""
+    global STATS_SNAPSHOT
     try:
         pool = await get_pool()
         stats = await get_embeddings_stats(pool)
-        stats["meta_tools_mode"] = META_TOOLS_MODE
-        stats["total_tools_cached"] = len(TOOLS_CACHE)
-        return stats
     except Exception as e:
-        return {
-            "error": str(e),
-            "meta_tools_mode": META_TOOLS_MODE,
-            "total_tools_cached": len(TOOLS_CACHE)
-        }
+        stats = {"error": str(e)}
+    STATS_SNAPSHOT = (stats, time.monotonic())
+
+
+async def stats_refresher():
+    """Background task: refresh the stats snapshot every STATS_REFRESH_INTERVAL seconds."""
+    while True:
+        await refresh_stats_snapshot()
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+
+
+@app.get("/meta/stats")
+async def meta_stats():
+    """Get statistics about tool embeddings (from the background snapshot)."""
+    if STATS_SNAPSHOT is None:
+        await refresh_stats_snapshot()
+    stats, taken_at = STATS_SNAPSHOT
+    return {
+        **stats,
+        "meta_tools_mode": META_TOOLS_MODE,
+        "total_tools_cached": len(TOOLS_CACHE),
+        "age_s": round(time.monotonic() - taken_at, 1)
+    }
 
 
 @app.get("/tenants")
 async def list_tenants(request: Request):
     """List tenants the current user has access to."""
     user = await extract_user_from_headers(request)
-    tenants = await get_user_tenants_configs_async(user.email, user.entra_groups if user else None)
+    tenants = await get_user_tenants_configs_async(user.email, request_groups(request, user))
     return {
         "user": user.email,
         "tenants": [
@@ -915,7 +1184,7 @@ async def list_tools(request: Request):
     user = await extract_user_from_headers(request)
 
     # Use async database lookup for tenant access
-    tenant_ids = await get_user_tenants_async(user.email, user.entra_groups if user else None)
+    tenant_ids = await get_user_tenants_async(user.email, request_groups(request, user))
 
     if not tenant_ids:
         return {
@@ -925,16 +1194,16 @@ async def list_tools(request: Request):
         }
 
     user_tools = [
-        tool for tool_name, tool in TOOLS_CACHE.items()
-        if tool["tenant_id"] in tenant_ids
+        tool for tenant_id in tenant_ids
+        for tool in TOOLS_BY_TENANT.get(tenant_id, ())
     ]
 
-    return {
+    return ORJSONResponse({
         "user": user.email,
         "tenant_count": len(tenant_ids),
         "tool_count": len(user_tools),
         "tools": user_tools
-    }
+    })
 
 
 # =============================================================================
@@ -967,21 +1236,23 @@ async def list_all_servers(request: Request):
     # Extract user info
     user = await extract_user_from_headers_optional(request)
     user_email = user.email if user else None
-    entra_groups = user.entra_groups if user else None
+    entra_groups = request_groups(request, user)
 
     # Debug: Log what we received
-    print(f"=== /servers request ===")
-    print(f"  User email: {user_email}")
-    print(f"  Entra groups: {entra_groups}")
-    print(f"  Group count: {len(entra_groups) if entra_groups else 0}")
-    print(f"  Headers:")
-    print(f"    X-OpenWebUI-User-Email = {request.headers.get('X-OpenWebUI-User-Email', 'NOT SET')}")
-    print(f"    X-OpenWebUI-User-Groups = {request.headers.get('X-OpenWebUI-User-Groups', 'NOT SET')}")
-    print(f"    X-User-Groups = {request.headers.get('X-User-Groups', 'NOT SET')}")
+    if logger.isEnabledFor(logging.DEBUG):
+        headers = request.headers
+        logger.debug(
+            "/servers request: user=%s groups=%s X-OpenWebUI-User-Email=%s "
+            "X-OpenWebUI-User-Groups=%s X-User-Groups=%s",
+            user_email, entra_groups,
+            headers.get("X-OpenWebUI-User-Email", "NOT SET"),
+            headers.get("X-OpenWebUI-User-Groups", "NOT SET"),
+            headers.get("X-User-Groups", "NOT SET")
+        )
 
     # If no user identified and auth is required, return empty list
     if not user_email and REQUIRE_AUTH_FOR_LISTING:
-        print(f"  WARN: No user identified, returning empty server list")
+        logger.warning("/servers: no user identified, returning empty server list")
         return {
             "total_servers": 0,
             "servers": [],
@@ -994,15 +1265,17 @@ async def list_all_servers(request: Request):
             }
         }
 
+    # Resolve the user's accessible servers once instead of once per server
+    allowed_servers = None
+    if user_email:
+        allowed_servers = await get_user_tenants_async(user_email, entra_groups)
+        logger.debug("  %s has access to: %s", user_email, allowed_servers)
+
     servers = []
     for server_id, config in ALL_SERVERS.items():
         # Filter by user access if user is identified
-        if user_email:
-            # Use async database lookup for production
-            has_access = await user_has_tenant_access_async(user_email, server_id, entra_groups)
-            print(f"  Checking {user_email} access to {server_id}: {has_access}")
-            if not has_access:
-                continue  # Skip servers user doesn't have access to
+        if allowed_servers is not None and server_id not in allowed_servers:
+            continue  # Skip servers user doesn't have access to
 
         servers.append({
             "id": server_id,
@@ -1014,7 +1287,7 @@ async def list_all_servers(request: Request):
             "tools_endpoint": f"/{server_id}",
         })
 
-    print(f"  Returning {len(servers)} servers for user {user_email}")
+    logger.debug("  returning %d servers for user %s", len(servers), user_email)
 
     # Group by tier for easier reading
     by_tier = {}
@@ -1024,7 +1297,7 @@ async def list_all_servers(request: Request):
             by_tier[tier] = []
         by_tier[tier].append(s)
 
-    return {
+    return ORJSONResponse({
         "total_servers": len(servers),
         "servers": servers,
         "by_tier": by_tier,
@@ -1033,7 +1306,7 @@ async def list_all_servers(request: Request):
             "execute_tool": "POST /{server_id}/{tool_name}",
             "example": "POST /github/search_repositories"
         }
-    }
+    })
 
 
 async def fetch_server_tools(server: MCPServerConfig) -> List[Dict]:
@@ -1044,37 +1317,55 @@ async def fetch_server_tools(server: MCPServerConfig) -> List[Dict]:
             {
                 "name": tool["original_name"],
                 "description": tool["description"],
-                "endpoint": f"/{server.server_id}/{tool['original_name']}"
+                "endpoint": tool["endpoint"]
             }
-            for tool_name, tool in TOOLS_CACHE.items()
-            if tool["tenant_id"] == server.server_id
+            for tool in TOOLS_BY_TENANT.get(server.server_id, ())
         ]
 
+    cached = REMOTE_TOOLS_CACHE.get(server.server_id)
+    if cached is not None:
+        return cached
+
     # For remote servers, try to fetch OpenAPI
     try:
         api_key = os.getenv(server.api_key_env, "") if server.api_key_env else ""
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{server.endpoint_url}/openapi.json",
-                headers={"Authorization": f"Bearer {api_key}"}
-            )
-            if response.status_code == 200:
-                openapi = response.json()
-                tools = []
-                for path, methods in openapi.get("paths", {}).items():
-                    if path in ["/health", "/docs", "/openapi.json", "/redoc", "/"]:
-                        continue
-                    for method, spec in methods.items():
-                        if method.lower() == "post":
+        headers = {"Authorization": f"Bearer {api_key}"}
+        previous = REMOTE_TOOLS_ETAGS.get(server.server_id)
+        if previous:
+            headers["If-None-Match"] = previous[0]
+        client = get_http_client()
+        response = await client.get(
+            f"{server.endpoint_url}/openapi.json",
+            timeout=10.0,
+            headers=headers
+        )
+        if response.status_code == 304 and previous:
+            REMOTE_TOOLS_CACHE[server.server_id] = previous[1]
+            return previous[1]
+        if response.status_code == 200:
+            openapi = orjson.loads(response.content)
+            tools = []
+            prefix = f"/{server.server_id}/"
+            for path, methods in openapi.get("paths", {}).items():
+                if path in SKIP_TOOL_PATHS:
+                    continue
+                tool_name = None
+                for method, spec in methods.items():
+                    if method.lower() == "post":
+                        if tool_name is None:
                             tool_name = path.strip("/").replace("/", "_")
-                            tools.append({
-                                "name": tool_name,
-                                "description": spec.get("summary", tool_name),
-                                "endpoint": f"/{server.server_id}/{tool_name}"
-                            })
-                return tools
+                        tools.append({
+                            "name": tool_name,
+                            "description": spec.get("summary", tool_name),
+                            "endpoint": prefix + tool_name
+                        })
+            REMOTE_TOOLS_CACHE[server.server_id] = tools
+            etag = response.headers.get("etag")
+            if etag:
+                REMOTE_TOOLS_ETAGS[server.server_id] = (etag, tools)
+            return tools
     except Exception as e:
-        print(f"Error fetching tools from {server.server_id}: {e}")
+        logger.warning("Error fetching tools from %s: %s", server.server_id, e)
 
     return [{"error": f"Could not fetch tools from {server.server_id}"}]
 
@@ -1082,8 +1373,9 @@ async def fetch_server_tools(server: MCPServerConfig) -> List[Dict]:
 async def execute_on_server(
     server: MCPServerConfig,
     tool_path: str,
-    body: dict,
-    tenant_ids: Optional[List[str]] = None
+    body: Any,
+    tenant_ids: Optional[Collection[str]] = None,
+    routing: Optional[Tuple[Dict[str, str], Optional[str]]] = None
 ) -> Any:
     """
     Execute a tool on any server based on its tier.
@@ -1095,20 +1387,27 @@ async def execute_on_server(
     Args:
         server: Server configuration
         tool_path: Path to the tool endpoint
-        body: Request body
+        body: Request body; bytes are forwarded as already-encoded JSON
         tenant_ids: User's tenant/group IDs for API key and endpoint lookup
+        routing: Already-fetched (tenant keys, endpoint override) for tenant_ids,
+            e.g. from prefetch_user_context(); skips the lookup when given
     """
-    # US-011: Look up tenant-specific API key first, fall back to global env var
+    # US-011: Look up tenant-specific API keys and endpoint override together
+    tenant_keys, override_url = {}, None
+    if routing is not None:
+        tenant_keys, override_url = routing
+    elif tenant_ids:
+        tenant_keys, override_url = await get_tenant_routing(tenant_ids, server.server_id)
+
+    # Use tenant-specific API key first, fall back to global env var
     api_key = None
     key_source = "default"
 
     if tenant_ids and server.api_key_env:
-        # Try to get tenant-specific key from database
-        tenant_keys = await get_tenant_api_keys_for_server(tenant_ids, server.server_id)
         if tenant_keys and server.api_key_env in tenant_keys:
             api_key = tenant_keys[server.api_key_env]
-            key_source = f"tenant:{tenant_ids[0]}"
-            print(f"  [TENANT-KEY] Using tenant-specific {server.api_key_env} for {server.server_id}")
+            key_source = "tenant"
+            logger.debug("  [TENANT-KEY] Using tenant-specific %s for %s", server.api_key_env, server.server_id)
 
     # Fall back to global environment variable
     if not api_key:
@@ -1117,43 +1416,42 @@ async def execute_on_server(
 
     # US-011: Dynamic endpoint routing - check for tenant-specific endpoint override
     endpoint_url = server.endpoint_url
-    if tenant_ids:
-        override_url = await get_tenant_endpoint_override(tenant_ids, server.server_id)
-        if override_url:
-            endpoint_url = override_url
-            print(f"  [DYNAMIC-ROUTING] Routing {server.server_id} to {override_url} for tenant {tenant_ids}")
+    if override_url:
+        endpoint_url = override_url
+        logger.debug("  [DYNAMIC-ROUTING] Routing %s to %s for tenant %s", server.server_id, override_url, tenant_ids)
 
     # Build the full URL
-    # For local servers, tool_path might already have leading slash
-    clean_path = tool_path.strip("/")
+    # For local servers, tool_path might already have leading slash; cached
+    # tools pass their precomputed clean_path
+    clean_path = tool_path.strip("/") if tool_path[:1] == "/" or tool_path[-1:] == "/" else tool_path
     url = f"{endpoint_url}/{clean_path}"
 
-    print(f"=== Executing on {server.server_id} ===")
-    print(f"  Tier: {server.tier.value}")
-    print(f"  URL: {url}")
-    print(f"  Key source: {key_source}")
-    print(f"  Body: {body}")
+    logger.debug(
+        "Executing on %s: tier=%s url=%s key_source=%s body=%s",
+        server.server_id, server.tier.value, url, key_source, body
+    )
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                json=body,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-            )
+        client = get_http_client()
+        response = await client.post(
+            url,
+            timeout=30.0,
+            content=body if isinstance(body, bytes) else orjson.dumps(body),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+        )
 
-            print(f"  Response: {response.status_code}")
+        logger.debug("  response: %s", response.status_code)
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Server {server.server_id} returned: {response.text}"
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Server {server.server_id} returned: {response.text}"
+            )
     except HTTPException:
         raise
     except Exception as e:
@@ -1167,7 +1465,7 @@ async def execute_tool_on_tenant(
     tenant_id: str,
     original_path: str,
     arguments: Dict[str, Any],
-    tenant_ids: Optional[List[str]] = None
+    tenant_ids: Optional[Collection[str]] = None
 ) -> Dict[str, Any]:
     """Execute a tool on the tenant's MCP server (supports both old TENANTS and new ALL_SERVERS)."""
     tenant = get_tenant(tenant_id)
@@ -1182,30 +1480,31 @@ async def execute_tool_on_tenant(
                 tenant_keys = await get_tenant_api_keys_for_server(tenant_ids, server.server_id)
                 if tenant_keys and server.api_key_env in tenant_keys:
                     api_key = tenant_keys[server.api_key_env]
-                    print(f"  [TENANT-KEY] Using tenant-specific key for {server.server_id}")
+                    logger.debug("  [TENANT-KEY] Using tenant-specific key for %s", server.server_id)
 
             # Fall back to global environment variable
             if not api_key:
                 api_key = os.getenv(server.api_key_env, "test-key") if server.api_key_env else "test-key"
 
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    headers = {
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    }
-                    response = await client.post(
-                        f"{server.endpoint_url}{original_path}",
-                        json=arguments,
-                        headers=headers
+                client = get_http_client()
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                response = await client.post(
+                    f"{server.endpoint_url}{original_path}",
+                    timeout=30.0,
+                    json=arguments,
+                    headers=headers
+                )
+                if response.status_code == 200:
+                    return response.json()
+                else:
+                    raise HTTPException(
+                        status_code=response.status_code,
+                        detail=f"Server {tenant_id} returned: {response.text}"
                     )
-                    if response.status_code == 200:
-                        return response.json()
-                    else:
-                        raise HTTPException(
-                            status_code=response.status_code,
-                            detail=f"Server {tenant_id} returned: {response.text}"
-                        )
             except HTTPException:
                 raise
             except Exception as e:
@@ -1213,29 +1512,30 @@ async def execute_tool_on_tenant(
         return {"success": False, "error": f"Tenant {tenant_id} not found"}
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            headers = {
-                "Authorization": f"Bearer {tenant.mcp_api_key}",
-                "Content-Type": "application/json"
-            }
+        client = get_http_client()
+        headers = {
+            "Authorization": f"Bearer {tenant.mcp_api_key}",
+            "Content-Type": "application/json"
+        }
 
-            # Inject tenant-specific credentials
-            for key, value in tenant.credentials.items():
-                headers[f"X-Tenant-{key}"] = value
+        # Inject tenant-specific credentials
+        for key, value in tenant.credentials.items():
+            headers[f"X-Tenant-{key}"] = value
 
-            response = await client.post(
-                f"{tenant.mcp_endpoint}{original_path}",
-                json=arguments,
-                headers=headers
-            )
+        response = await client.post(
+            f"{tenant.mcp_endpoint}{original_path}",
+            timeout=30.0,
+            json=arguments,
+            headers=headers
+        )
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=response.text
-                )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=response.text
+            )
     except HTTPException:
         raise
     except Exception as e:
@@ -1246,11 +1546,12 @@ async def execute_tool_on_tenant(
 # HIERARCHICAL ENDPOINTS: /{server_id} and /{server_id}/{tool_path}
 # =============================================================================
 
-# List of known server IDs to distinguish from legacy tool names
-KNOWN_SERVER_IDS = set(ALL_SERVERS.keys())
+# Known server IDs, to reject unknown /{server_id} paths before any other
+# work. ALL_SERVERS is fixed at import, so this never needs rebuilding.
+KNOWN_SERVER_IDS: frozenset = frozenset(ALL_SERVERS)
 
 # Reserved paths that should NOT be treated as server IDs
-RESERVED_PATHS = {"admin", "meta", "health", "servers", "refresh", "tenants", "tools", "debug", "openapi.json", "docs", "redoc", "portal"}
+RESERVED_PATHS = frozenset({"admin", "meta", "health", "servers", "refresh", "tenants", "tools", "debug", "openapi.json", "docs", "redoc", "portal"})
 
 
 @app.get("/{server_id}")
@@ -1265,33 +1566,38 @@ async def get_server_tools(server_id: str, request: Request):
         raise HTTPException(status_code=404, detail=f"Use /{server_id}/* endpoints directly")
 
     # Check if this is a known server
-    server = get_server(server_id)
-    if not server:
+    if server_id not in KNOWN_SERVER_IDS:
         # Not a server, might be a debug endpoint or invalid
         raise HTTPException(
             status_code=404,
             detail=f"Server '{server_id}' not found. Use GET /servers for available servers."
         )
+    server = ALL_SERVERS[server_id]
 
-    # Check user access
-    user = await extract_user_from_headers_optional(request)
-    if user:
-        has_access = await user_has_tenant_access_async(user.email, server_id, user.entra_groups if user else None)
-        if not has_access:
-            raise HTTPException(
-                status_code=403,
-                detail=f"User {user.email} does not have access to server '{server_id}'"
-            )
+    # Fetch tools while the access check runs; the fetch is cancelled if
+    # the check denies access or fails
+    tools_task = asyncio.create_task(fetch_server_tools(server))
+    try:
+        user = await extract_user_from_headers_optional(request)
+        if user:
+            has_access = await user_has_tenant_access_async(user.email, server_id, request_groups(request, user))
+            if not has_access:
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"User {user.email} does not have access to server '{server_id}'"
+                )
+    except BaseException:
+        tools_task.cancel()
+        raise
 
-    # Fetch tools for this server
-    tools = await fetch_server_tools(server)
+    tools = await tools_task
 
     # Get example tool name safely (tools might be error objects or empty)
     example_tool = "tool_name"
     if tools and isinstance(tools[0], dict) and "name" in tools[0]:
         example_tool = tools[0]["name"]
 
-    return {
+    return ORJSONResponse({
         "server": server_id,
         "name": server.display_name,
         "tier": server.tier.value,
@@ -1303,7 +1609,7 @@ async def get_server_tools(server_id: str, request: Request):
             "execute": f"POST /{server_id}/{{tool_name}}",
             "example": f"POST /{server_id}/{example_tool}"
         }
-    }
+    })
 
 
 @app.post("/{server_id}/{tool_path:path}")
@@ -1324,12 +1630,12 @@ async def execute_server_tool(server_id: str, tool_path: str, request: Request):
         )
 
     # Check if this is a known server
-    server = get_server(server_id)
-    if not server:
+    if server_id not in KNOWN_SERVER_IDS:
         raise HTTPException(
             status_code=404,
             detail=f"Server '{server_id}' not found. Use GET /servers for available servers."
         )
+    server = ALL_SERVERS[server_id]
 
     if not server.enabled:
         raise HTTPException(
@@ -1337,8 +1643,7 @@ async def execute_server_tool(server_id: str, tool_path: str, request: Request):
             detail=f"Server '{server_id}' is currently disabled"
         )
 
-    # DEBUG: Log ALL headers to see what Open WebUI sends
-    print(f"=== Tool Execution: /{server_id}/{tool_path} ===")
+    logger.debug("Tool execution: /%s/%s", server_id, tool_path)
 
     # Try to get user from multiple sources:
     # 1. X-OpenWebUI-User-Email header (preferred)
@@ -1357,53 +1662,64 @@ async def execute_server_tool(server_id: str, tool_path: str, request: Request):
                 name=query_email.split("@")[0],
                 role="user"
             )
-            print(f"  User from query param: {user.email}")
+            logger.debug("  user from query param: %s", user.email)
+
+    logger.debug("  extracted user: %s", user.email if user else None)
 
-    print(f"  Extracted user: {user.email if user else 'None'}")
+    # Without groups from auth, prefetch groups, tenant keys and endpoint
+    # override for this server in one database round trip
+    context = None
+    if user and not user.entra_groups:
+        context = await prefetch_user_context(user.email, server_id)
 
     if user:
         # Use async database lookup for production
-        has_access = await user_has_tenant_access_async(user.email, server_id, user.entra_groups if user else None)
+        access_groups = request_groups(request, user) or (context["groups"] if context else None)
+        has_access = await user_has_tenant_access_async(user.email, server_id, access_groups)
         if not has_access:
-            print(f"  ACCESS DENIED: {user.email} -> {server_id}")
+            logger.info("ACCESS DENIED: %s -> %s", user.email, server_id)
             raise HTTPException(
                 status_code=403,
                 detail=f"User {user.email} does not have access to server '{server_id}'"
             )
-        print(f"  ACCESS GRANTED: {user.email} -> {server_id}")
+        logger.debug("  access granted: %s -> %s", user.email, server_id)
     else:
-        print(f"  WARNING: No user identified, allowing anonymous access")
+        logger.warning("No user identified for /%s/%s, allowing anonymous access", server_id, tool_path)
 
-    # Parse request body
+    # Parse request body; invalid JSON is sent to the backend as {}
+    raw = await request.body()
+    logger.debug("  raw body received: %s", raw)
     try:
-        body = await request.json()
-    except:
-        body = {}
-
-    print(f"=== Hierarchical Route: /{server_id}/{tool_path} ===")
-    print(f"  Raw body received: {body}")
+        parsed = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        parsed = {}
 
     # Handle Open WebUI format: might send {"arguments": {...}} instead of direct params
-    if "arguments" in body and isinstance(body["arguments"], dict):
-        print(f"  Unwrapping 'arguments' key")
-        body = body["arguments"]
-        print(f"  Unwrapped body: {body}")
+    if isinstance(parsed, dict) and isinstance(parsed.get("arguments"), dict):
+        body = parsed["arguments"]
+        logger.debug("  unwrapped 'arguments' key: %s", body)
+    elif isinstance(parsed, dict) and parsed:
+        # A valid JSON object needing no unwrapping goes out as the received
+        # bytes, skipping a re-encode for the backend
+        body = raw
+    else:
+        body = parsed
 
     # Get user's groups for dynamic routing and API key lookup (US-011)
     # We need GROUP names (like 'MCP-GitHub') not tenant/server IDs (like 'github')
     user_groups = None
+    routing = None
     if user:
-        # First use groups from auth (entra_groups), then fall back to database lookup
+        # First use groups from auth (entra_groups), then fall back to the prefetched context
         if user.entra_groups:
             user_groups = user.entra_groups
         else:
-            # Look up groups from database
-            from db import get_user_groups
-            user_groups = await get_user_groups(user.email)
-        print(f"  [ROUTING] User {user.email} groups for routing: {user_groups}")
+            user_groups = context["groups"]
+            routing = (context["keys"], context["endpoint"])
+        logger.debug("  [ROUTING] User %s groups for routing: %s", user.email, user_groups)
 
     # Execute based on server tier
-    return await execute_on_server(server, tool_path, body, user_groups)
+    return await execute_on_server(server, tool_path, body, user_groups, routing)
 
 
 # =============================================================================
@@ -1411,6 +1727,11 @@ async def execute_server_tool(server_id: str, tool_path: str, request: Request):
 # =============================================================================
 # Format: /{tenant}_{tool_name} (e.g., /github_search_repositories)
 # Kept for backward compatibility with existing integrations
+#
+# One catch-all route resolved with a TOOLS_CACHE dict lookup, registered
+# last so it never shadows the fixed POST routes above. Starlette matches
+# routes in order, so a route per tool would lengthen the scan for every
+# request and would need re-registering after each tools refresh.
 # =============================================================================
 
 @app.post("/{tool_name}")
@@ -1425,14 +1746,13 @@ async def execute_tool_endpoint_legacy(tool_name: str, request: Request):
           Example: /github/search_repositories
     """
     # DEBUG: Log all incoming headers
-    print(f"=== Legacy Tool Call: {tool_name} ===")
-    print("Headers received:")
-    for key, value in request.headers.items():
-        # Mask sensitive values but show they exist
-        if key.lower() in ['authorization', 'cookie']:
-            print(f"  {key}: {value[:50]}..." if len(value) > 50 else f"  {key}: {value}")
-        else:
-            print(f"  {key}: {value}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Legacy tool call: %s", tool_name)
+        for key, value in request.headers.items():
+            # Mask sensitive values but show they exist
+            if key.lower() in ['authorization', 'cookie'] and len(value) > 50:
+                value = value[:50] + "..."
+            logger.debug("  %s: %s", key, value)
 
     # Get tool info from cache
     tool_info = TOOLS_CACHE.get(tool_name)
@@ -1444,12 +1764,14 @@ async def execute_tool_endpoint_legacy(tool_name: str, request: Request):
 
     # Try to extract user for access control
     user = await extract_user_from_headers_optional(request)
-    print(f"User extracted: {user.email if user else 'None'}")
+    logger.debug("  extracted user: %s", user.email if user else None)
 
+    # Enforce access control if user headers present. The user's tenant IDs
+    # are resolved once and serve both the check and the API key lookup (US-011).
+    tenant_ids = None
     if user:
-        # Enforce access control if user headers present - use async database lookup
-        has_access = await user_has_tenant_access_async(user.email, tenant_id, user.entra_groups if user else None)
-        if not has_access:
+        tenant_ids = await get_user_tenants_async(user.email, request_groups(request, user))
+        if tenant_id not in tenant_ids:
             raise HTTPException(
                 status_code=403,
                 detail=f"User {user.email} does not have access to tenant '{tenant_id}'"
@@ -1461,11 +1783,6 @@ async def execute_tool_endpoint_legacy(tool_name: str, request: Request):
     except:
         body = {}
 
-    # Get user's tenant IDs for API key lookup (US-011)
-    tenant_ids = None
-    if user:
-        tenant_ids = await get_user_tenants_async(user.email, user.entra_groups if user else None)
-
     # Execute the tool
     result = await execute_tool_on_tenant(tenant_id, original_path, body, tenant_ids)
     return result
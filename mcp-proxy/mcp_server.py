@@ -21,16 +21,28 @@ The user's email is automatically extracted from the MCP session context.
 """
 
 import os
-import json
+import sys
+import time
+import queue
+import atexit
+import asyncio
+import hashlib
+import random
+import logging
+import logging.handlers
 import httpx
 import jwt
+import orjson
 from typing import Optional, Any
+from urllib.parse import urlparse
+from cachetools import TTLCache
 from fastmcp import FastMCP, Context
 from fastmcp.exceptions import ToolError
 
 from tenants import (
     ALL_SERVERS, MCPServerConfig, ServerTier,
-    user_has_server_access, get_tenants_from_entra_groups
+    user_has_server_access, get_tenants_from_entra_groups,
+    get_user_tenants_async
 )
 import db  # Database module for tenant access lookups
 
@@ -47,16 +59,33 @@ DEBUG = os.getenv("DEBUG", "true").lower() == "true"
 WEBUI_SECRET_KEY = os.getenv("WEBUI_SECRET_KEY", "")
 
 
-def log(msg: str):
-    """Debug logging."""
-    if DEBUG:
-        print(f"[MCP-PROXY] {msg}")
+# Log records go through a queue to a listener thread that owns stdout, so
+# a slow or full stdout pipe never blocks the event loop
+logger = logging.getLogger("mcp_proxy.mcp_server")
+logger.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+logger.propagate = False
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter("[MCP-PROXY] %(message)s"))
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, _stdout_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+
+def log(msg: str, *args):
+    """Debug logging; %-style args are only formatted when DEBUG is on."""
+    logger.debug(msg, *args)
 
 
 # =============================================================================
 # OPEN WEBUI JWT VALIDATION
 # =============================================================================
 
+# Open WebUI sends the same token for a whole session, so validated claims
+# are kept briefly, keyed by a digest of the token (never the token itself)
+_jwt_cache: TTLCache = TTLCache(maxsize=4096, ttl=300.0)
+
 def validate_openwebui_jwt(token: str) -> dict:
     """
     Validate Open WebUI's JWT and extract user claims.
@@ -76,13 +105,18 @@ def validate_openwebui_jwt(token: str) -> dict:
     if not WEBUI_SECRET_KEY:
         raise ValueError("WEBUI_SECRET_KEY not configured - JWT validation disabled")
 
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    claims = _jwt_cache.get(cache_key)
+    if claims is not None and claims.get("exp", float("inf")) > time.time():
+        return claims
+
     try:
-        # Debug: decode without verification to see token structure
-        unverified = jwt.decode(token, options={"verify_signature": False})
-        header = jwt.get_unverified_header(token)
-        log(f"[JWT-DEBUG] Token header: {header}")
-        log(f"[JWT-DEBUG] Token claims: {list(unverified.keys())}")
-        log(f"[JWT-DEBUG] Using secret key (first 20 chars): {WEBUI_SECRET_KEY[:20]}...")
+        if DEBUG:
+            # Decode without verification to see token structure
+            unverified = jwt.decode(token, options={"verify_signature": False})
+            header = jwt.get_unverified_header(token)
+            log(f"[JWT-DEBUG] Token header: {header}")
+            log(f"[JWT-DEBUG] Token claims: {list(unverified.keys())}")
 
         # Decode and validate the JWT
         claims = jwt.decode(
@@ -90,13 +124,14 @@ def validate_openwebui_jwt(token: str) -> dict:
             WEBUI_SECRET_KEY,
             algorithms=["HS256"]
         )
-        log(f"[JWT] Valid token - claims: {list(claims.keys())}")
+        log("[JWT] Valid token - claims: %s", list(claims))
+        _jwt_cache[cache_key] = claims
         return claims
     except jwt.ExpiredSignatureError:
         log("[JWT] Token expired")
         raise ValueError("Token expired")
     except jwt.InvalidTokenError as e:
-        log(f"[JWT] Invalid token: {e}")
+        log("[JWT] Invalid token: %s", e)
         raise ValueError(f"Invalid token: {e}")
 
 
@@ -131,14 +166,19 @@ mcp = FastMCP(
 # USER CONTEXT EXTRACTION
 # =============================================================================
 
+def _request_headers(ctx: Context):
+    """Return the HTTP request headers behind an MCP context, or None."""
+    request_context = getattr(ctx, 'request_context', None)
+    request = getattr(request_context, 'request', None) if request_context else None
+    headers = getattr(request, 'headers', None) if request else None
+    return headers if headers and hasattr(headers, 'get') else None
+
+
 def get_auth_header_from_context(ctx: Context) -> Optional[str]:
     """Extract Authorization header from MCP context."""
-    if hasattr(ctx, 'request_context') and ctx.request_context:
-        request = getattr(ctx.request_context, 'request', None)
-        if request:
-            headers = getattr(request, 'headers', None)
-            if headers and hasattr(headers, 'get'):
-                return headers.get('Authorization') or headers.get('authorization')
+    headers = _request_headers(ctx)
+    if headers:
+        return headers.get('Authorization') or headers.get('authorization')
     return None
 
 
@@ -161,8 +201,9 @@ async def get_user_info_from_context(ctx: Context) -> tuple[Optional[str], list[
     user_email = None
     user_tenants = []
 
-    # Step 1: Get Authorization header
-    auth_header = get_auth_header_from_context(ctx)
+    # Step 1: Get Authorization header (headers are resolved once for all steps)
+    headers = _request_headers(ctx)
+    auth_header = (headers.get('Authorization') or headers.get('authorization')) if headers else None
 
     if not auth_header or not auth_header.startswith("Bearer "):
         log("[AUTH] No Bearer token in Authorization header")
@@ -178,39 +219,39 @@ async def get_user_info_from_context(ctx: Context) -> tuple[Optional[str], list[
     try:
         # Validate the JWT - this proves the request came from Open WebUI
         jwt_claims = validate_openwebui_jwt(token)
-        log(f"[JWT] Token validated successfully")
+        log("[JWT] Token validated successfully")
 
         # Step 3: Now we can trust the headers - get user email
         # The JWT proves this request came from Open WebUI, so headers are trustworthy
-        user_email = _get_user_email_from_headers(ctx)
+        user_email = _get_user_email_from_headers(headers)
 
         if not user_email:
             # Fallback: try to get email from JWT claims directly
             user_email = jwt_claims.get("email") or jwt_claims.get("sub")
             if user_email:
-                log(f"[JWT] Got email from JWT claims: {user_email}")
+                log("[JWT] Got email from JWT claims: %s", user_email)
 
         if not user_email:
             log("[AUTH] JWT valid but no user email found")
             return None, []
 
-        log(f"[AUTH] Authenticated user: {user_email}")
+        log("[AUTH] Authenticated user: %s", user_email)
 
         # Step 4: Lookup tenant access from database
         user_tenants = await db.get_user_tenants(user_email)
-        log(f"[DATABASE] User {user_email} has access to: {user_tenants}")
+        log("[DATABASE] User %s has access to: %s", user_email, user_tenants)
 
         return user_email, user_tenants
 
     except ValueError as e:
-        log(f"[JWT] Validation failed: {e}")
+        log("[JWT] Validation failed: %s", e)
         return None, []
     except Exception as e:
-        log(f"[AUTH] Unexpected error: {e}")
+        log("[AUTH] Unexpected error: %s", e)
         return None, []
 
 
-def _get_user_email_from_headers(ctx: Context) -> Optional[str]:
+def _get_user_email_from_headers(headers) -> Optional[str]:
     """
     Extract user email from X-OpenWebUI-User-Email header.
 
@@ -218,15 +259,11 @@ def _get_user_email_from_headers(ctx: Context) -> Optional[str]:
     The JWT validation proves the request came from Open WebUI,
     making these headers trustworthy.
     """
-    if hasattr(ctx, 'request_context') and ctx.request_context:
-        request = getattr(ctx.request_context, 'request', None)
-        if request:
-            headers = getattr(request, 'headers', None)
-            if headers and hasattr(headers, 'get'):
-                email = headers.get('X-OpenWebUI-User-Email') or headers.get('x-openwebui-user-email')
-                if email:
-                    log(f"[HEADERS] Got email from X-OpenWebUI-User-Email: {email}")
-                    return email
+    if headers:
+        email = headers.get('X-OpenWebUI-User-Email') or headers.get('x-openwebui-user-email')
+        if email:
+            log("[HEADERS] Got email from X-OpenWebUI-User-Email: %s", email)
+            return email
     return None
 
 
@@ -237,27 +274,29 @@ def _get_user_email_from_context(ctx: Context) -> Optional[str]:
     Open WebUI's native MCP client forwards user information in the session.
     We can access it through ctx.request_context or ctx.meta.
     """
-    # Debug: Log all context attributes
-    log(f"=== SESSION AUTH DEBUG ===")
-    log(f"Context type: {type(ctx)}")
-    log(f"Context attributes: {[a for a in dir(ctx) if not a.startswith('_')]}")
-
-    # CRITICAL: Check for Authorization header (OAuth token)
-    if hasattr(ctx, 'request_context') and ctx.request_context:
-        request = getattr(ctx.request_context, 'request', None)
-        if request and hasattr(request, 'headers'):
-            auth_header = request.headers.get('authorization') or request.headers.get('Authorization')
-            if auth_header:
-                log(f"[AUTH HEADER FOUND] Authorization: {auth_header[:50]}..." if len(str(auth_header)) > 50 else f"[AUTH HEADER FOUND] Authorization: {auth_header}")
-                # Check if it's a Bearer token
-                if auth_header.startswith('Bearer '):
-                    token = auth_header[7:]
-                    log(f"[BEARER TOKEN] Length: {len(token)} chars")
-                    log(f"[BEARER TOKEN] First 100 chars: {token[:100]}...")
-            else:
-                log(f"[AUTH HEADER] No Authorization header found")
-            # Log ALL headers for complete picture
-            log(f"[ALL HEADERS] {dict(request.headers)}")
+    # Debug dumps walk dir() and format every header; skip them outright
+    # unless DEBUG is on
+    if DEBUG:
+        log(f"=== SESSION AUTH DEBUG ===")
+        log(f"Context type: {type(ctx)}")
+        log(f"Context attributes: {[a for a in dir(ctx) if not a.startswith('_')]}")
+
+        # CRITICAL: Check for Authorization header (OAuth token)
+        if hasattr(ctx, 'request_context') and ctx.request_context:
+            request = getattr(ctx.request_context, 'request', None)
+            if request and hasattr(request, 'headers'):
+                auth_header = request.headers.get('authorization') or request.headers.get('Authorization')
+                if auth_header:
+                    log(f"[AUTH HEADER FOUND] Authorization: {auth_header[:50]}..." if len(str(auth_header)) > 50 else f"[AUTH HEADER FOUND] Authorization: {auth_header}")
+                    # Check if it's a Bearer token
+                    if auth_header.startswith('Bearer '):
+                        token = auth_header[7:]
+                        log(f"[BEARER TOKEN] Length: {len(token)} chars")
+                        log(f"[BEARER TOKEN] First 100 chars: {token[:100]}...")
+                else:
+                    log(f"[AUTH HEADER] No Authorization header found")
+                # Log ALL headers for complete picture
+                log(f"[ALL HEADERS] {dict(request.headers)}")
 
     # Try multiple ways to get user email
     user_email = None
@@ -355,8 +394,15 @@ def _get_user_email_from_context(ctx: Context) -> Optional[str]:
             log(f"User email from state: {user_email}")
             return user_email
 
+    if DEBUG:
+        _log_context_attributes(ctx)
+
+    return None
+
+
+def _log_context_attributes(ctx: Context):
+    """One-shot debug dump of every non-callable attribute on an MCP context."""
     log("No user email found in context - full debug:")
-    # Log all attributes for debugging
     for attr in dir(ctx):
         if not attr.startswith('_'):
             try:
@@ -366,21 +412,25 @@ def _get_user_email_from_context(ctx: Context) -> Optional[str]:
             except Exception as e:
                 log(f"  ctx.{attr} = ERROR: {e}")
 
-    return None
+
+# tenant_id -> server IDs that tenant grants (today server_id == tenant_id);
+# lets get_user_servers walk the user's tenants rather than every server
+_servers_by_tenant: dict[str, frozenset[str]] = {
+    server_id: frozenset((server_id,)) for server_id in ALL_SERVERS
+}
 
 
-def get_user_servers(user_email: Optional[str], user_groups: list[str] = None) -> list[str]:
+async def get_user_servers(user_email: Optional[str], user_groups: list[str] = None) -> list[str]:
     """Get list of server IDs the user has access to."""
     if not user_email:
         log("No user email, returning empty server list")
         return []
 
-    servers = []
-    for server_id in ALL_SERVERS.keys():
-        if user_has_server_access(user_email, server_id, user_groups):
-            servers.append(server_id)
+    # One tenant resolution for all servers instead of an access check per server
+    tenant_ids = await get_user_tenants_async(user_email, user_groups)
+    servers = sorted(set().union(*(_servers_by_tenant.get(t, ()) for t in tenant_ids)))
 
-    log(f"User {user_email} (groups={user_groups}) has access to: {servers}")
+    log("User %s (groups=%s) has access to: %s", user_email, user_groups, servers)
     return servers
 
 
@@ -413,7 +463,7 @@ If you're using Open WebUI:
 
 Your user email should be automatically forwarded."""
 
-    allowed_servers = get_user_servers(user_email, user_groups)
+    allowed_servers = await get_user_servers(user_email, user_groups)
 
     if not allowed_servers:
         return f"No servers available for {user_email}. Contact admin for access."
@@ -449,15 +499,13 @@ async def check_my_access(ctx: Context) -> str:
     if not user_email:
         return "User not identified. Please ensure you're logged into Open WebUI."
 
-    # Get detailed access info from database (user_groups contains tenant_ids from DB)
-    access_info = []
-    for tenant_id in user_groups:
-        # Look up access level from database
-        access_level = await db.get_user_access_level(user_email, tenant_id)
-        access_info.append({
-            "server": tenant_id,
-            "level": access_level or "read"
-        })
+    # Get detailed access info from database (user_groups contains tenant_ids from DB),
+    # all tenants' access levels in one query
+    access_levels = await db.get_user_access_levels_bulk(user_email, user_groups)
+    access_info = [
+        {"server": tenant_id, "level": access_levels.get(tenant_id) or "read"}
+        for tenant_id in user_groups
+    ]
 
     result = f"## Access Report for {user_email}\n\n"
 
@@ -476,31 +524,132 @@ async def check_my_access(ctx: Context) -> str:
 # PROXY TOOL EXECUTION
 # =============================================================================
 
+# One pooled client for all backend calls, so repeated tool calls reuse
+# keep-alive connections instead of paying a TCP/TLS handshake each time.
+# It lives for the whole process. Pool size is tunable per deployment; keep
+# enough keep-alive slots for several hosts at MCP_PER_HOST_CONCURRENCY.
+BACKEND_CLIENT: Optional[httpx.AsyncClient] = None
+BACKEND_MAX_CONNECTIONS = int(os.getenv("MCP_BACKEND_MAX_CONNECTIONS", "200"))
+BACKEND_MAX_KEEPALIVE = int(os.getenv("MCP_BACKEND_MAX_KEEPALIVE", "50"))
+
+# Hosts whose negotiated HTTP version has been logged
+_protocol_logged: set[str] = set()
+
+# Cap on in-flight tool calls per backend host, so a burst of calls queues
+# here instead of exhausting sockets or tripping backend rate limits
+MCP_PER_HOST_CONCURRENCY = int(os.getenv("MCP_PER_HOST_CONCURRENCY", "32"))
+_semaphores_by_host: dict[str, asyncio.Semaphore] = {}
+
+
+def _semaphore_for(url: str) -> asyncio.Semaphore:
+    """Return the concurrency semaphore for the URL's host."""
+    host = urlparse(url).netloc
+    semaphore = _semaphores_by_host.get(host)
+    if semaphore is None:
+        semaphore = _semaphores_by_host[host] = asyncio.Semaphore(MCP_PER_HOST_CONCURRENCY)
+    return semaphore
+
+
+def get_backend_client() -> httpx.AsyncClient:
+    """Return the shared backend client (HTTP/2 when the h2 package is installed)."""
+    global BACKEND_CLIENT
+    if BACKEND_CLIENT is None:
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        BACKEND_CLIENT = httpx.AsyncClient(
+            timeout=30.0,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKEND_MAX_KEEPALIVE,
+                keepalive_expiry=60
+            )
+        )
+    return BACKEND_CLIENT
+
+
+# server_id -> request headers; API keys come from the environment, which
+# doesn't change while the process runs
+_backend_headers: dict[str, dict[str, str]] = {}
+
+
+def _headers_for(server: MCPServerConfig) -> dict[str, str]:
+    """Return the (shared, read-only) backend request headers for a server."""
+    headers = _backend_headers.get(server.server_id)
+    if headers is None:
+        api_key = os.getenv(server.api_key_env, MCP_API_KEY) if server.api_key_env else MCP_API_KEY
+        headers = _backend_headers[server.server_id] = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    return headers
+
+
+# Retries for failures where the backend never ran the tool: the connection
+# could not be made, or it answered 503 (not accepting requests). Anything
+# else - including 502, which can follow a partly processed request - isn't
+# retried, since tool calls (e.g. write_file) may not be idempotent.
+BACKEND_MAX_ATTEMPTS = max(1, int(os.getenv("MCP_BACKEND_MAX_ATTEMPTS", "4")))
+_RETRY_STATUSES = frozenset((503,))
+_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retry number `attempt` (1-based)."""
+    return min(0.1 * 2 ** attempt, 2.0) * random.uniform(0.5, 1.0)
+
+
 async def execute_on_backend(server: MCPServerConfig, tool_name: str, args: dict) -> Any:
     """Execute a tool on a backend MCP server."""
-    api_key = os.getenv(server.api_key_env, MCP_API_KEY) if server.api_key_env else MCP_API_KEY
     url = f"{server.endpoint_url}/{tool_name}"
 
-    log(f"Executing {tool_name} on {server.server_id}: {url}")
-    log(f"Args: {json.dumps(args)[:200]}")
-
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                url,
-                json=args,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-            )
+    # Serialized once: sent as the body as-is, and its head is what gets logged
+    payload = orjson.dumps(args)
 
-            log(f"Response: {response.status_code}")
+    log("Executing %s on %s: %s", tool_name, server.server_id, url)
+    log("Args: %s", payload[:200])
 
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise ToolError(f"Backend error ({response.status_code}): {response.text[:500]}")
+    try:
+        for attempt in range(1, BACKEND_MAX_ATTEMPTS + 1):
+            last_attempt = attempt == BACKEND_MAX_ATTEMPTS
+            if attempt > 1:
+                await asyncio.sleep(_backoff_delay(attempt - 1))
+            try:
+                # Streamed so an error body is only read as far as the message needs
+                async with _semaphore_for(url), get_backend_client().stream(
+                    "POST",
+                    url,
+                    content=payload,
+                    headers=_headers_for(server)
+                ) as response:
+                    log("Response: %s", response.status_code)
+                    if DEBUG and response.url.host not in _protocol_logged:
+                        _protocol_logged.add(response.url.host)
+                        log("Backend %s negotiated %s", response.url.host, response.http_version)
+
+                    if response.status_code == 200:
+                        return orjson.loads(await response.aread())
+
+                    if response.status_code in _RETRY_STATUSES and not last_attempt:
+                        log("Backend %s returned %s, retrying (attempt %s)", server.server_id, response.status_code, attempt)
+                        continue
+
+                    # 500 characters take at most 2000 bytes; decode that much and
+                    # cut by character so a multi-byte character is never split
+                    detail = b""
+                    async for chunk in response.aiter_bytes():
+                        detail += chunk
+                        if len(detail) >= 2000:
+                            break
+                    text = detail[:2000].decode(response.encoding or "utf-8", errors="ignore")
+                    raise ToolError(f"Backend error ({response.status_code}): {text[:500]}")
+            except _RETRY_ERRORS as e:
+                if last_attempt:
+                    raise
+                log("Backend %s unreachable (%s), retrying (attempt %s)", server.server_id, e, attempt)
 
     except httpx.TimeoutException:
         raise ToolError(f"Timeout connecting to {server.display_name}")
@@ -508,6 +657,14 @@ async def execute_on_backend(server: MCPServerConfig, tool_name: str, args: dict
         raise ToolError(f"Error: {str(e)}")
 
 
+def _json_preview(result: dict, limit: int) -> str:
+    """Pretty-printed JSON for a tool result, cut to its first `limit` characters."""
+    encoded = orjson.dumps(result, option=orjson.OPT_INDENT_2)
+    # UTF-8 uses at most 4 bytes per character, so only the bytes that can
+    # land in the preview are decoded; a character split at the cut lies past it
+    return encoded[:limit * 4].decode(errors="ignore")[:limit]
+
+
 # =============================================================================
 # GITHUB TOOLS (when user has 'github' access)
 # =============================================================================
@@ -536,7 +693,7 @@ async def github_search_repositories(
 
     # Format the result nicely
     if isinstance(result, dict):
-        return json.dumps(result, indent=2)[:3000]
+        return _json_preview(result, 3000)
     return str(result)[:3000]
 
 
@@ -563,7 +720,7 @@ async def github_list_repos(
     args = {"username": username} if username else {}
     result = await execute_on_backend(server, "list_repositories", args)
 
-    return json.dumps(result, indent=2)[:3000] if isinstance(result, dict) else str(result)[:3000]
+    return _json_preview(result, 3000) if isinstance(result, dict) else str(result)[:3000]
 
 
 @mcp.tool
@@ -596,7 +753,7 @@ async def github_get_file(
         "path": path
     })
 
-    return json.dumps(result, indent=2)[:5000] if isinstance(result, dict) else str(result)[:5000]
+    return _json_preview(result, 5000) if isinstance(result, dict) else str(result)[:5000]
 
 
 # =============================================================================
@@ -625,7 +782,7 @@ async def filesystem_list_directory(
     server = ALL_SERVERS["filesystem"]
     result = await execute_on_backend(server, "list_directory", {"path": path})
 
-    return json.dumps(result, indent=2)[:3000] if isinstance(result, dict) else str(result)[:3000]
+    return _json_preview(result, 3000) if isinstance(result, dict) else str(result)[:3000]
 
 
 @mcp.tool
@@ -650,7 +807,7 @@ async def filesystem_read_file(
     server = ALL_SERVERS["filesystem"]
     result = await execute_on_backend(server, "read_file", {"path": path})
 
-    return json.dumps(result, indent=2)[:5000] if isinstance(result, dict) else str(result)[:5000]
+    return _json_preview(result, 5000) if isinstance(result, dict) else str(result)[:5000]
 
 
 @mcp.tool
@@ -721,14 +878,14 @@ async def execute_tool(
 
     # Parse arguments
     try:
-        args = json.loads(arguments) if arguments else {}
-    except json.JSONDecodeError:
+        args = orjson.loads(arguments) if arguments else {}
+    except orjson.JSONDecodeError:
         raise ToolError(f"Invalid JSON arguments: {arguments}")
 
     # Execute
     result = await execute_on_backend(server, tool_name, args)
 
-    return json.dumps(result, indent=2)[:5000] if isinstance(result, dict) else str(result)[:5000]
+    return _json_preview(result, 5000) if isinstance(result, dict) else str(result)[:5000]
 
 
 # =============================================================================
@@ -11,10 +11,12 @@ This module defines:
 Kubernetes deployment: localhost:8080
 """
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from enum import Enum
+from cachetools import TTLCache
 import os
 import asyncio
+import time
 
 
 # =============================================================================
@@ -765,6 +767,51 @@ def user_has_tenant_access(user_email: str, tenant_id: str,
     return False
 
 
+# Resolved (email, groups) -> tenant IDs, stored as (fetched_at, db access
+# version, tenants). Any access write, in this worker or another (via the db
+# NOTIFY listener), bumps the version and retires every entry. Hits older than
+# ACCESS_REWARM_TTL are still served while one background task per key
+# re-resolves them (stale-while-revalidate).
+ACCESS_CACHE_TTL = 60.0
+ACCESS_REWARM_TTL = 30.0
+_access_cache: TTLCache = TTLCache(maxsize=10_000, ttl=ACCESS_CACHE_TTL)
+_access_rewarming: Dict[tuple, asyncio.Task] = {}
+
+
+def _access_key(user_email: str, entra_groups: Optional[List[str]]) -> tuple:
+    """Cache key for a user's resolved tenants; group order doesn't matter."""
+    return user_email.lower(), frozenset(entra_groups) if entra_groups else None
+
+
+def _cached_user_tenants(key: tuple, user_email: str,
+                         entra_groups: Optional[List[str]]) -> Optional[FrozenSet[str]]:
+    """Return cached tenants for key (scheduling a rewarm when old), or None on a miss."""
+    import db
+    entry = _access_cache.get(key)
+    if entry is None:
+        return None
+    fetched_at, version, tenant_ids = entry
+    if version != db.access_version():
+        return None
+    if time.monotonic() - fetched_at > ACCESS_REWARM_TTL and key not in _access_rewarming:
+        _access_rewarming[key] = asyncio.create_task(
+            _rewarm_user_tenants(key, user_email, entra_groups)
+        )
+    return tenant_ids
+
+
+async def _rewarm_user_tenants(key: tuple, user_email: str, entra_groups: Optional[List[str]]):
+    """Background refresh of one _access_cache entry."""
+    import db
+    try:
+        version = db.access_version()
+        tenant_ids, complete = await _resolve_user_tenants(user_email, entra_groups)
+        if complete:
+            _access_cache[key] = (time.monotonic(), version, tenant_ids)
+    finally:
+        _access_rewarming.pop(key, None)
+
+
 async def user_has_tenant_access_async(user_email: str, tenant_id: str,
                                         entra_groups: Optional[List[str]] = None) -> bool:
     """
@@ -785,6 +832,11 @@ async def user_has_tenant_access_async(user_email: str, tenant_id: str,
     """
     import db  # Import here to avoid circular imports
 
+    # Answer from the user's resolved tenants when they are already cached
+    cached = _cached_user_tenants(_access_key(user_email, entra_groups), user_email, entra_groups)
+    if cached is not None:
+        return tenant_id in cached
+
     # If groups not provided via headers, look them up from database
     if not entra_groups or len(entra_groups) == 0:
         try:
@@ -820,7 +872,7 @@ async def user_has_tenant_access_async(user_email: str, tenant_id: str,
         return False
 
 
-async def get_user_tenants_async(user_email: str, entra_groups: Optional[List[str]] = None) -> List[str]:
+async def get_user_tenants_async(user_email: str, entra_groups: Optional[List[str]] = None) -> FrozenSet[str]:
     """
     Get all tenant IDs a user has access to (ASYNC version with database).
 
@@ -829,7 +881,8 @@ async def get_user_tenants_async(user_email: str, entra_groups: Optional[List[st
         entra_groups: Optional list of Entra ID/Open WebUI groups
 
     Returns:
-        List of tenant IDs the user has access to
+        Frozenset of tenant IDs the user has access to (shared with the
+        cache, so callers can test membership without copying)
 
     Sources:
         1. MCP-Admin group (grants ALL servers)
@@ -838,41 +891,66 @@ async def get_user_tenants_async(user_email: str, entra_groups: Optional[List[st
     """
     import db
 
+    key = _access_key(user_email, entra_groups)
+    cached = _cached_user_tenants(key, user_email, entra_groups)
+    if cached is not None:
+        return cached
+
+    version = db.access_version()
+    tenant_ids, complete = await _resolve_user_tenants(user_email, entra_groups)
+    # Don't cache a partial answer from a failed lookup
+    if complete:
+        _access_cache[key] = (time.monotonic(), version, tenant_ids)
+    return tenant_ids
+
+
+async def _resolve_user_tenants(user_email: str,
+                                entra_groups: Optional[List[str]]) -> Tuple[FrozenSet[str], bool]:
+    """Resolve a user's tenant IDs from the database; returns (tenants, no lookup failed)."""
+    import db
+
     tenant_ids = set()
+    db_tenants = None
+    complete = True
 
     # If groups not provided via headers, look them up from database
+    # (together with the user's direct tenants, in one round trip)
     if not entra_groups or len(entra_groups) == 0:
         try:
-            entra_groups = await db.get_user_groups(user_email)
+            db_tenants, entra_groups = await db.get_user_auth_context(user_email, raise_errors=True)
             print(f"  [DB-GROUPS] Looked up groups for {user_email}: {entra_groups}")
         except Exception as e:
             print(f"  [DB-GROUPS] Error looking up groups: {e}")
             entra_groups = []
+            complete = False
 
     # Source 0: MCP-Admin grants access to ALL servers (Lukas's requirement)
     if entra_groups and "MCP-Admin" in entra_groups:
-        all_server_ids = list(ALL_SERVERS.keys())
+        all_server_ids = frozenset(ALL_SERVERS)
         print(f"  [MCP-ADMIN] {user_email} has MCP-Admin -> ALL {len(all_server_ids)} servers")
-        return all_server_ids
+        return all_server_ids, complete
 
     # Source 1: Group-based access (from group_tenant_mapping table)
     if entra_groups and len(entra_groups) > 0:
         try:
-            group_tenants = await db.get_tenants_from_groups(entra_groups)
+            group_tenants = await db.get_tenants_from_groups(entra_groups, raise_errors=True)
             tenant_ids.update(group_tenants)
             print(f"  [GROUP-BASED-DB] {user_email} -> {len(group_tenants)} tenants from groups")
         except Exception as e:
             print(f"  [GROUP-BASED-DB] Error: {e}")
+            complete = False
 
     # Source 2: Database lookup by email (from user_tenant_access table)
     try:
-        db_tenants = await db.get_user_tenants(user_email)
+        if db_tenants is None:
+            db_tenants = await db.get_user_tenants(user_email, raise_errors=True)
         tenant_ids.update(db_tenants)
         print(f"  [DATABASE] {user_email} -> {len(db_tenants)} tenants from database")
     except Exception as e:
         print(f"  [DATABASE] Error: {e}")
+        complete = False
 
-    return list(tenant_ids)
+    return frozenset(tenant_ids), complete
 
 
 # =============================================================================
@@ -0,0 +1,51 @@
+"""Tests for tenant access resolution in tenants.py."""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import tenants  # noqa: E402
+
+
+def _clear_caches():
+    tenants._access_cache.clear()
+    db._user_tenants_cache.clear()
+    db._user_groups_cache.clear()
+    db._groups_cache.clear()
+
+
+def test_pool_error_is_not_cached(monkeypatch):
+    """A failed lookup must not leave an empty tenant set in _access_cache."""
+    async def broken_pool():
+        raise ConnectionError("pool unavailable")
+
+    monkeypatch.setattr(db, "get_pool", broken_pool)
+    _clear_caches()
+
+    result = asyncio.run(tenants.get_user_tenants_async("user@example.com"))
+    assert result == frozenset()
+    assert len(tenants._access_cache) == 0
+
+    result = asyncio.run(tenants.get_user_tenants_async("user@example.com", ["Tenant-Google"]))
+    assert result == frozenset()
+    assert len(tenants._access_cache) == 0
+
+
+def test_successful_lookup_is_cached(monkeypatch):
+    """A complete lookup is cached for the next request."""
+    async def user_tenants(email, raise_errors=False):
+        return ["github"]
+
+    async def tenants_from_groups(groups, raise_errors=False):
+        return ["filesystem"]
+
+    monkeypatch.setattr(db, "get_user_tenants", user_tenants)
+    monkeypatch.setattr(db, "get_tenants_from_groups", tenants_from_groups)
+    _clear_caches()
+
+    result = asyncio.run(tenants.get_user_tenants_async("user@example.com", ["Tenant-Google"]))
+    assert result == frozenset({"github", "filesystem"})
+    assert len(tenants._access_cache) == 1
@@ -18,15 +18,36 @@ References:
 
 import os
 import asyncpg
+from collections import deque
+from cachetools import LRUCache
 from typing import Dict, List, Any, Optional
 
 # Embedding model config
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
 EMBEDDING_DIM = 384
 
+# HNSW candidate list size per query: higher means better recall, slower search
+HNSW_EF_SEARCH = int(os.getenv("EMBEDDING_HNSW_EF_SEARCH", "40"))
+
+# Whether pgvector supports iterative index scans (>= 0.8); checked once
+_iterative_scan: Optional[bool] = None
+
 # Lazy-loaded embedding model
 _embedding_model = None
 
+# Query cache for search_tools_by_query. Agents repeat near-identical queries,
+# so query text -> embedding skips the model on verbatim repeats, and results
+# are kept per (query, allowed servers, limit). A new query whose embedding
+# has cosine >= QUERY_CACHE_SIMILARITY with one of the last QUERY_NEIGHBOURS
+# queries reuses that query's results. store_tool_embeddings clears results.
+QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "5000"))
+QUERY_CACHE_SIMILARITY = float(os.getenv("EMBEDDING_QUERY_CACHE_SIMILARITY", "0.97"))
+QUERY_NEIGHBOURS = 256
+_query_vectors: LRUCache = LRUCache(maxsize=QUERY_CACHE_SIZE)   # text -> unit vector
+_search_results: LRUCache = LRUCache(maxsize=QUERY_CACHE_SIZE)  # (text, servers, limit) -> results
+_recent_queries: deque = deque(maxlen=QUERY_NEIGHBOURS)         # (text, unit vector)
+_query_cache_stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
 
 def log(msg: str):
     """Debug logging."""
@@ -63,6 +84,34 @@ def generate_embedding(text: str) -> Optional[List[float]]:
     return None
 
 
+def _query_vector(text: str):
+    """Unit-norm numpy embedding for a normalized query, cached per text."""
+    vec = _query_vectors.get(text)
+    if vec is None:
+        model = get_embedding_model()
+        if not model:
+            return None
+        import numpy as np  # installed with fastembed
+        embeddings = list(model.embed([text]))
+        if not embeddings:
+            return None
+        vec = np.asarray(embeddings[0], dtype=np.float32)
+        vec /= (np.linalg.norm(vec) or 1.0)
+        _query_vectors[text] = vec
+    return vec
+
+
+def _similar_query(vec) -> Optional[str]:
+    """Most similar recent query at or above QUERY_CACHE_SIMILARITY, if any."""
+    if not _recent_queries:
+        return None
+    import numpy as np
+    texts = [text for text, _ in _recent_queries]
+    scores = np.stack([v for _, v in _recent_queries]) @ vec
+    best = int(scores.argmax())
+    return texts[best] if scores[best] >= QUERY_CACHE_SIMILARITY else None
+
+
 def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
     """Generate embedding vectors for multiple texts."""
     model = get_embedding_model()
@@ -72,6 +121,20 @@ def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
     return [emb.tolist() for emb in model.embed(texts)]
 
 
+async def _supports_iterative_scan(conn: asyncpg.Connection) -> bool:
+    """Check (once) whether the installed pgvector has hnsw.iterative_scan."""
+    global _iterative_scan
+    if _iterative_scan is None:
+        version = await conn.fetchval(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+        )
+        try:
+            _iterative_scan = tuple(int(p) for p in version.split(".")[:2]) >= (0, 8)
+        except (AttributeError, ValueError):
+            _iterative_scan = False
+    return _iterative_scan
+
+
 async def ensure_embeddings_table(pool: asyncpg.Pool):
     """Create the tool_embeddings table if it doesn't exist."""
     async with pool.acquire() as conn:
@@ -85,19 +148,31 @@ async def ensure_embeddings_table(pool: asyncpg.Pool):
                 updated_at TIMESTAMP DEFAULT NOW()
             )
         """)
-        # Create index for vector similarity search (ivfflat for speed)
-        # Note: ivfflat needs at least some rows to build. We use a low lists
-        # count since we expect <1000 tools.
+        # Create index for vector similarity search. HNSW (pgvector >= 0.5)
+        # gives sub-linear lookups with better recall than ivfflat and needs
+        # no training rows, so the ivfflat index it replaces is dropped.
         try:
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tool_embeddings_vector
+                CREATE INDEX IF NOT EXISTS idx_tool_embeddings_hnsw
                 ON mcp_proxy.tool_embeddings
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 10)
+                USING hnsw (embedding vector_cosine_ops)
+                WITH (m = 16, ef_construction = 200)
             """)
+            await conn.execute("DROP INDEX IF EXISTS mcp_proxy.idx_tool_embeddings_vector")
         except Exception as e:
-            # ivfflat index creation fails on empty tables, that's OK
-            log(f"Index creation note: {e}")
+            log(f"HNSW index unavailable, using ivfflat: {e}")
+            # Older pgvector: ivfflat with a low lists count since we expect
+            # <1000 tools
+            try:
+                await conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_tool_embeddings_vector
+                    ON mcp_proxy.tool_embeddings
+                    USING ivfflat (embedding vector_cosine_ops)
+                    WITH (lists = 10)
+                """)
+            except Exception as e:
+                # ivfflat index creation fails on empty tables, that's OK
+                log(f"Index creation note: {e}")
 
 
 async def store_tool_embeddings(
@@ -110,6 +185,8 @@ async def store_tool_embeddings(
         return 0
 
     await ensure_embeddings_table(pool)
+    # Stored tools are about to change: cached search results are stale
+    _search_results.clear()
 
     # Build text representations for embedding
     tool_texts = []
@@ -213,21 +290,53 @@ async def search_tools_by_query(
 
     Returns list of dicts with: tool_name, server_id, display_name, description, relevance_score
     """
+    text = " ".join(query.lower().split())
+    servers_key = frozenset(allowed_servers) if allowed_servers else None
+    cache_key = (text, servers_key, limit)
+    cached = _search_results.get(cache_key)
+    if cached is not None:
+        _query_cache_stats["exact_hits"] += 1
+        return list(cached)
+
     # Generate query embedding
-    query_embedding = generate_embedding(query)
+    query_vec = _query_vector(text)
 
-    if query_embedding is None:
+    if query_vec is None:
         # Fallback: keyword search
         log("No embedding model, using keyword fallback")
         return await _keyword_search(pool, query, allowed_servers, limit)
 
-    vec_str = "[" + ",".join(str(x) for x in query_embedding) + "]"
-
-    async with pool.acquire() as conn:
-        # Set ivfflat probes high enough for accurate results
-        await conn.execute("SET ivfflat.probes = 10")
+    # Near-duplicate of a recent query: reuse its results
+    similar = _similar_query(query_vec)
+    if similar is not None:
+        cached = _search_results.get((similar, servers_key, limit))
+        if cached is not None:
+            _query_cache_stats["semantic_hits"] += 1
+            _search_results[cache_key] = cached
+            return list(cached)
+    _query_cache_stats["misses"] += 1
+
+    vec_str = "[" + ",".join(str(x) for x in query_vec.tolist()) + "]"
+
+    async with pool.acquire() as conn, conn.transaction():
+        # Search settings scoped to this transaction so they don't leak to
+        # other users of the pooled connection. ef_search must cover the
+        # LIMIT; probes applies when only the ivfflat index exists.
+        await conn.execute(f"SET LOCAL hnsw.ef_search = {max(HNSW_EF_SEARCH, limit)}")
+        await conn.execute("SET LOCAL ivfflat.probes = 10")
 
         if allowed_servers:
+            # The index scan returns at most ef_search nearest candidates and
+            # the server_id filter is applied to them afterwards, so a user
+            # who sees few servers could get fewer than `limit` results.
+            # pgvector >= 0.8 keeps scanning until the filter is satisfied;
+            # older versions get an exact scan, which is cheap at our table
+            # size (<1000 tools).
+            if await _supports_iterative_scan(conn):
+                await conn.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+                await conn.execute("SET LOCAL ivfflat.iterative_scan = relaxed_order")
+            else:
+                await conn.execute("SET LOCAL enable_indexscan = off")
             rows = await conn.fetch("""
                 SELECT
                     tool_name,
@@ -241,6 +350,8 @@ async def search_tools_by_query(
                 ORDER BY embedding <=> $1::vector
                 LIMIT $3
             """, vec_str, allowed_servers, limit)
+            # relaxed_order may return neighbours slightly out of order
+            rows = sorted(rows, key=lambda r: r["similarity"], reverse=True)
         else:
             rows = await conn.fetch("""
                 SELECT
@@ -255,7 +366,7 @@ async def search_tools_by_query(
                 LIMIT $2
             """, vec_str, limit)
 
-    return [
+    results = [
         {
             "tool_name": row["tool_name"],
             "server_id": row["server_id"],
@@ -265,6 +376,9 @@ async def search_tools_by_query(
         }
         for row in rows
     ]
+    _search_results[cache_key] = results
+    _recent_queries.append((text, query_vec))
+    return list(results)
 
 
 async def _keyword_search(
@@ -333,7 +447,8 @@ async def get_embeddings_stats(pool: asyncpg.Pool) -> Dict[str, Any]:
                 "without_embeddings": total - with_embeddings,
                 "model": EMBEDDING_MODEL,
                 "dimension": EMBEDDING_DIM,
-                "by_server": {row["server_id"]: row["count"] for row in servers}
+                "by_server": {row["server_id"]: row["count"] for row in servers},
+                "query_cache": dict(_query_cache_stats, cached_results=len(_search_results))
             }
     except Exception as e:
         return {"error": str(e)}
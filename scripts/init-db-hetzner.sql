@@ -44,9 +44,22 @@ CREATE TABLE IF NOT EXISTS mcp_proxy.user_group_membership (
 CREATE INDEX IF NOT EXISTS idx_user_group_membership_email
     ON mcp_proxy.user_group_membership (user_email);
 
--- Index for quick lookups by group
-CREATE INDEX IF NOT EXISTS idx_user_group_membership_group
-    ON mcp_proxy.user_group_membership (group_name);
+-- Index for quick lookups by group (covers get_group_users / user counts)
+CREATE INDEX IF NOT EXISTS idx_user_group_membership_group_cover
+    ON mcp_proxy.user_group_membership (group_name) INCLUDE (user_email);
+DROP INDEX IF EXISTS mcp_proxy.idx_user_group_membership_group;
+
+-- Emails are stored lowercased and compared on the plain column. Normalize
+-- rows written before that, dropping case-only duplicates first.
+DELETE FROM mcp_proxy.user_group_membership a
+    USING mcp_proxy.user_group_membership b
+    WHERE LOWER(a.user_email) = LOWER(b.user_email)
+      AND a.group_name = b.group_name
+      AND a.ctid > b.ctid;
+UPDATE mcp_proxy.user_group_membership
+    SET user_email = LOWER(user_email)
+    WHERE user_email <> LOWER(user_email);
+DROP INDEX IF EXISTS mcp_proxy.idx_user_group_membership_email_lower;
 
 -- =============================================================================
 -- GROUP TENANT MAPPING
@@ -61,9 +74,10 @@ CREATE TABLE IF NOT EXISTS mcp_proxy.group_tenant_mapping (
     PRIMARY KEY (group_name, tenant_id)
 );
 
--- Index for quick lookups by group
-CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_group
-    ON mcp_proxy.group_tenant_mapping (group_name);
+-- Index for quick lookups by group (covers the group -> servers aggregation)
+CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_group_cover
+    ON mcp_proxy.group_tenant_mapping (group_name) INCLUDE (tenant_id);
+DROP INDEX IF EXISTS mcp_proxy.idx_group_tenant_mapping_group;
 
 -- Index for quick lookups by tenant
 CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_tenant
@@ -175,8 +189,14 @@ CREATE TABLE IF NOT EXISTS mcp_proxy.tool_embeddings (
 CREATE INDEX IF NOT EXISTS idx_tool_embeddings_server
     ON mcp_proxy.tool_embeddings (server_id);
 
--- Note: ivfflat vector index is created after data is inserted
--- (requires non-empty table). The tool_embeddings module handles this.
+-- HNSW index for cosine similarity search (pgvector >= 0.5). Unlike ivfflat
+-- it needs no training data, so it can be built on the empty table. The
+-- tool_embeddings module falls back to ivfflat on older pgvector versions.
+CREATE INDEX IF NOT EXISTS idx_tool_embeddings_hnsw
+    ON mcp_proxy.tool_embeddings
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 200);
+DROP INDEX IF EXISTS mcp_proxy.idx_tool_embeddings_vector;
 
 -- =============================================================================
 -- HELPER VIEWS (in mcp_proxy schema)
@@ -257,6 +277,26 @@ CREATE INDEX IF NOT EXISTS idx_api_analytics_endpoint
 -- CREATE TABLE mcp_proxy.api_analytics_2026_01 PARTITION OF mcp_proxy.api_analytics
 --     FOR VALUES FROM ('2026-01-01') TO ('2026-02-01');
 
+-- =============================================================================
+-- DIRECT USER-TENANT ACCESS
+-- =============================================================================
+-- user_tenant_access is created outside this script; normalize its emails
+-- (see user_group_membership above) when present
+DO $$
+BEGIN
+    IF to_regclass('mcp_proxy.user_tenant_access') IS NOT NULL THEN
+        DELETE FROM mcp_proxy.user_tenant_access a
+            USING mcp_proxy.user_tenant_access b
+            WHERE LOWER(a.user_email) = LOWER(b.user_email)
+              AND a.tenant_id = b.tenant_id
+              AND a.ctid > b.ctid;
+        UPDATE mcp_proxy.user_tenant_access
+            SET user_email = LOWER(user_email)
+            WHERE user_email <> LOWER(user_email);
+        DROP INDEX IF EXISTS mcp_proxy.idx_user_tenant_access_email_lower;
+    END IF;
+END $$;
+
 -- =============================================================================
 -- DONE
 -- =============================================================================
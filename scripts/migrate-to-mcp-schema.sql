@@ -83,13 +83,27 @@ END $$;
 -- Step 4: Create indexes on new tables
 CREATE INDEX IF NOT EXISTS idx_user_group_membership_email
     ON mcp_proxy.user_group_membership (user_email);
-CREATE INDEX IF NOT EXISTS idx_user_group_membership_group
-    ON mcp_proxy.user_group_membership (group_name);
-CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_group
-    ON mcp_proxy.group_tenant_mapping (group_name);
+CREATE INDEX IF NOT EXISTS idx_user_group_membership_group_cover
+    ON mcp_proxy.user_group_membership (group_name) INCLUDE (user_email);
+DROP INDEX IF EXISTS mcp_proxy.idx_user_group_membership_group;
+CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_group_cover
+    ON mcp_proxy.group_tenant_mapping (group_name) INCLUDE (tenant_id);
+DROP INDEX IF EXISTS mcp_proxy.idx_group_tenant_mapping_group;
 CREATE INDEX IF NOT EXISTS idx_group_tenant_mapping_tenant
     ON mcp_proxy.group_tenant_mapping (tenant_id);
 
+-- Emails are stored lowercased and compared on the plain column. Normalize
+-- rows written before that, dropping case-only duplicates first.
+DELETE FROM mcp_proxy.user_group_membership a
+    USING mcp_proxy.user_group_membership b
+    WHERE LOWER(a.user_email) = LOWER(b.user_email)
+      AND a.group_name = b.group_name
+      AND a.ctid > b.ctid;
+UPDATE mcp_proxy.user_group_membership
+    SET user_email = LOWER(user_email)
+    WHERE user_email <> LOWER(user_email);
+DROP INDEX IF EXISTS mcp_proxy.idx_user_group_membership_email_lower;
+
 -- Step 5: Create views in mcp_proxy schema
 CREATE OR REPLACE VIEW mcp_proxy.user_server_access AS
 SELECT DISTINCT